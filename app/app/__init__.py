@@ -1,21 +1,33 @@
+import logging
 import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from config import Config
-from app.routes.form import form_bp
+from app.replica import RoutingSession
 
-db = SQLAlchemy()
+# Session با مسیریابی خواندن به replica (app/replica.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 csrf = CSRFProtect()
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+
+    # لاگ از طریق صف و thread پس‌زمینه (app/logs.py)
+    from app import logs
+    logs.init_app(app)
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['SNAPSHOT_FOLDER'], exist_ok=True)
 
+    # گزینه‌های engine و PRAGMAهای SQLite (app/database.py) و bind مربوط به replica
+    from app import database, replica
+    database.configure(app)
+    replica.configure(app)
     db.init_app(app)
+    database.init_app(app)
     login_manager.init_app(app)
     csrf.init_app(app)
     login_manager.login_view = 'auth.login'
@@ -26,14 +38,28 @@ def create_app():
     from app.routes.user import user_bp
     from app.routes.form import form_bp
     from app.routes.settings import settings_bp
+    from app.routes.reports import reports_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(form_bp)
-    print("✅ Blueprint form ثبت شد")
     app.register_blueprint(settings_bp)
+    app.register_blueprint(reports_bp)
+
+    from app import cache, identity, structures, rendering, sql_profiler, metrics, passwords, ratelimit
+    cache.init_app(app)
+    identity.init_app(app)
+    structures.init_app(app)
+    rendering.init_app(app)
+    sql_profiler.init_app(app)
+    metrics.init_app(app)
+    replica.init_app(app)
+    passwords.init_app(app)
+    ratelimit.init_app(app)
 
+    logging.getLogger(__name__).info('برنامه آماده شد (%d blueprint)', len(app.blueprints))
     return app
 
-from app import models
\ No newline at end of file
+from app import models
+from app import permissions
\ No newline at end of file
@@ -0,0 +1,215 @@
+# app/access.py
+"""
+دسترسی هر کاربر به هر فرم، به صورت بیت.
+
+هر ردیف FormAccess یک grant برای یک نقش یا یک کاربر است و حقوقش در ستون
+عددی permission_bits ذخیره می‌شه (ستون متنی permissions فقط برای نمایش
+و سازگاری با داده‌های قدیمی نگه داشته شده). دسترسی مؤثر کاربر روی یک فرم:
+
+    OR همه grantهای نقشش | OR همه grantهای خودش | همه بیت‌ها اگر سازنده فرم باشه
+
+ادمین و دارنده form.manage_all به همه فرم‌ها دسترسی کامل دارن.
+نتیجه‌ها در طول یک درخواست در g نگه داشته می‌شن؛ کش بین درخواست‌ها لازم
+نیست چون هر دو کوئری روی ایندکس‌ها هستن.
+"""
+from flask import g, has_app_context
+from sqlalchemy import and_, insert, or_, select
+from app import db
+from app.models import Form, FormAccess
+
+VIEW = 1
+FILL = 2
+EDIT = 4
+DELETE = 8
+MANAGE = 16
+FULL = VIEW | FILL | EDIT | DELETE | MANAGE
+
+NAMES = {'view': VIEW, 'fill': FILL, 'edit': EDIT, 'delete': DELETE, 'manage': MANAGE, 'full': FULL}
+
+
+def parse_permissions(value):
+    """'view,fill' / ['view', 'fill'] / 'full' -> بیت‌ها (نام‌های ناشناخته نادیده گرفته می‌شن)"""
+    if isinstance(value, str):
+        value = value.split(',')
+    bits = 0
+    for name in value or ():
+        bits |= NAMES.get(name.strip().lower(), 0)
+    return bits
+
+
+def format_permissions(bits):
+    """بیت‌ها -> 'view,fill' (یا 'full')"""
+    if bits & FULL == FULL:
+        return 'full'
+    return ','.join(name for name, bit in NAMES.items() if name != 'full' and bits & bit)
+
+
+def _memo(name):
+    return g.setdefault(name, {}) if has_app_context() else {}
+
+
+def has_full_access(user):
+    """ادمین و form.manage_all همه فرم‌ها رو با همه بیت‌ها دارن"""
+    return user.is_admin() or user.has_permission('form.manage_all')
+
+
+def _grant_filter(user):
+    """grantهای مربوط به این کاربر: نقشش یا خودش"""
+    return or_(
+        and_(FormAccess.access_type == 'role', FormAccess.target_id == user.role_id),
+        and_(FormAccess.access_type == 'user', FormAccess.target_id == user.id),
+    )
+
+
+def effective_rights(user, form_id):
+    """بیت‌های دسترسی کاربر روی فرم، با یک کوئری (مالکیت + grantها)"""
+    if not getattr(user, 'is_authenticated', False):
+        return 0
+    memo = _memo('_form_rights')
+    key = (user.id, form_id)
+    if key in memo:
+        return memo[key]
+
+    if has_full_access(user):
+        bits = FULL
+    else:
+        rows = (db.session.query(Form.created_by, FormAccess.permission_bits)
+                .outerjoin(FormAccess, and_(FormAccess.form_id == Form.id, _grant_filter(user)))
+                .filter(Form.id == form_id)
+                .all())
+        bits = 0
+        for created_by, grant_bits in rows:
+            if created_by == user.id:
+                bits = FULL
+                break
+            bits |= grant_bits or 0
+    memo[key] = bits
+    return bits
+
+
+def can(user, form_id, required):
+    """آیا کاربر همه بیت‌های required رو روی فرم داره"""
+    return effective_rights(user, form_id) & required == required
+
+
+def accessible_forms(user, required=VIEW):
+    """
+    کوئری فرم‌هایی که کاربر حداقل یکی از بیت‌های required رو روشون داره
+    (ساخته شده توسط خودش یا با grant نقش/کاربر)؛ یک کوئری روی ایندکس‌ها
+    """
+    query = Form.query
+    if has_full_access(user):
+        return query
+    granted = (select(FormAccess.form_id)
+               .where(_grant_filter(user))
+               .where(FormAccess.permission_bits.op('&')(required) != 0))
+    return query.filter(or_(Form.created_by == user.id, Form.id.in_(granted)))
+
+
+def accessible_form_ids(user, required=VIEW):
+    """شناسه فرم‌های قابل دسترس؛ در طول درخواست فقط یک بار خونده می‌شه"""
+    memo = _memo('_accessible_forms')
+    key = (user.id, required)
+    if key not in memo:
+        memo[key] = frozenset(form_id for (form_id,) in
+                              accessible_forms(user, required).with_entities(Form.id))
+    return memo[key]
+
+
+def set_grant(form_id, access_type, target_id, bits):
+    """
+    جایگزین کردن grant یک نقش/کاربر روی فرم (bits=0 یعنی حذف)؛
+    commit با صدا زننده است
+    """
+    FormAccess.query.filter_by(form_id=form_id, access_type=access_type, target_id=target_id).delete()
+    if bits:
+        db.session.add(FormAccess(form_id=form_id, access_type=access_type, target_id=target_id,
+                                  permission_bits=bits, permissions=format_permissions(bits)))
+    forget()
+
+
+def parse_grant_matrix(items):
+    """
+    لیست JSON grantها -> {(access_type, target_id): bits}؛ ValueError برای ورودی نامعتبر.
+    permissions می‌تونه لیست نام‌ها، رشته 'view,fill' یا عدد بیت‌ها باشه.
+    """
+    if not isinstance(items, list):
+        raise ValueError('grants باید لیست باشه')
+    grants = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError('هر grant باید یک شیء باشه')
+        access_type = item.get('access_type')
+        if access_type not in ('role', 'user'):
+            raise ValueError(f'نوع دسترسی نامعتبر: {access_type}')
+        try:
+            target_id = int(item.get('target_id'))
+        except (TypeError, ValueError):
+            raise ValueError('target_id نامعتبر')
+        permissions = item.get('permissions')
+        if isinstance(permissions, int) and not isinstance(permissions, bool):
+            bits = permissions & FULL
+        elif isinstance(permissions, (list, str)) or permissions is None:
+            bits = parse_permissions(permissions)
+        else:
+            raise ValueError('permissions نامعتبر')
+        key = (access_type, target_id)
+        if key in grants:
+            raise ValueError(f'grant تکراری: {access_type} {target_id}')
+        grants[key] = bits
+    return grants
+
+
+def apply_grants(form_id, grants, replace=True):
+    """
+    اعمال یکجای grantهای یک فرم؛ grants: {(access_type, target_id): bits}.
+    با ردیف‌های موجود مقایسه می‌شه و فقط تفاوت‌ها نوشته می‌شن (در یک flush)؛
+    با replace، grantهایی که در grants نیستن حذف می‌شن. commit با صدا زننده است.
+    """
+    existing = FormAccess.query.filter_by(form_id=form_id).all()
+    changes = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    seen = set()
+    for row in existing:
+        key = (row.access_type, row.target_id)
+        bits = grants.get(key, None if replace else row.permission_bits)
+        if key in seen or not bits:
+            # ردیف تکراری قدیمی، یا grant حذف شده
+            db.session.delete(row)
+            changes['deleted'] += 1
+        elif row.permission_bits != bits:
+            row.permission_bits = bits
+            row.permissions = format_permissions(bits)
+            changes['updated'] += 1
+        else:
+            changes['unchanged'] += 1
+        seen.add(key)
+
+    new_rows = [{'form_id': form_id, 'access_type': access_type, 'target_id': target_id,
+                 'permission_bits': bits, 'permissions': format_permissions(bits)}
+                for (access_type, target_id), bits in grants.items()
+                if bits and (access_type, target_id) not in seen]
+    if new_rows:
+        # insert گروهی (executemany)؛ شناسه ردیف‌ها لازم نیست
+        db.session.execute(insert(FormAccess), new_rows)
+    changes['inserted'] = len(new_rows)
+    forget()
+    return changes
+
+
+def grant_matrix(form_id):
+    """{'role': {id: [نام‌ها]}, 'user': {...}} برای صفحه مدیریت دسترسی"""
+    matrix = {'role': {}, 'user': {}}
+    rows = (db.session.query(FormAccess.access_type, FormAccess.target_id, FormAccess.permission_bits)
+            .filter(FormAccess.form_id == form_id))
+    for access_type, target_id, bits in rows:
+        if access_type in matrix and bits:
+            names = format_permissions(bits).split(',')
+            matrix[access_type][target_id] = ['view', 'fill', 'edit', 'full'] if names == ['full'] else names
+    return matrix
+
+
+def forget():
+    """پاک کردن نتایج این درخواست (بعد از تغییر grantها)"""
+    if has_app_context():
+        g.pop('_form_rights', None)
+        g.pop('_accessible_forms', None)
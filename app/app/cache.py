@@ -0,0 +1,212 @@
+# app/cache.py
+"""
+کش‌های درون‌پردازه‌ای و باطل‌سازی آن‌ها پس از تغییر داده‌ها.
+
+وقتی چند worker داریم، هر تغییر «مشترک» (نقش، دسترسی، FormAccess و ...)
+شمارنده جدول cache_generation رو در همون تراکنش یک واحد بالا می‌بره و
+هر worker در ابتدای هر درخواست با یک خواندن روی کلید اصلی، اگر شمارنده
+عوض شده باشه همه کش‌های محلی خودش رو پاک می‌کنه.
+"""
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# نام ردیف شمارنده در جدول cache_generation
+GENERATION_NAME = 'rbac'
+
+# همه کش‌های ساخته شده، برای پاک‌سازی یکجا
+_registry = []
+
+# (مدل‌ها, تابع, مشترک) - بعد از commit تغییرات این مدل‌ها، تابع صدا زده می‌شه
+_watchers = []
+
+# آخرین مقدار شمارنده‌ای که این پردازه دیده
+_seen_generation = None
+# یعنی «مقدار فعلی معلوم نیست»؛ بررسی بعدی حتماً کش‌ها رو پاک می‌کنه
+_STALE = object()
+
+
+class LocalCache:
+    """
+    کش ساده و thread-safe درون یک پردازه، با انقضای اختیاری (ttl به ثانیه)
+    و سقف اختیاری تعداد آیتم‌ها (maxsize)؛ با پر شدن، کم‌استفاده‌ترین آیتم حذف می‌شه (LRU)
+    """
+
+    def __init__(self, name, ttl=None, maxsize=None):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            if self.maxsize is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            if self.maxsize is not None:
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def invalidate_all():
+    """پاک کردن همه کش‌های محلی این پردازه"""
+    for cache in _registry:
+        cache.clear()
+
+
+def on_commit_change(models, callback=None, shared=False):
+    """
+    ثبت تابعی که بعد از commit تغییر روی یکی از models صدا زده می‌شه.
+    ورودی تابع لیست آبجکت‌های تغییر کرده است؛ برای insert/update/delete گروهی
+    (query.delete()) خود کلاس مدل در لیست قرار می‌گیره.
+
+    اگر shared باشه، تغییر شمارنده مشترک رو هم بالا می‌بره تا بقیه
+    workerها (و خود این پردازه) همه کش‌هاشون رو دور بریزن. shared می‌تونه
+    تابع (session, obj) هم باشه که برای هر تغییر (بعد از flush، با تاریخچه
+    ستون‌ها) تصمیم می‌گیره؛ برای تغییر گروهی obj خود کلاس مدل است.
+    """
+    _watchers.append((tuple(models), callback, shared))
+
+
+def _matches(obj, models):
+    if isinstance(obj, type):
+        return issubclass(obj, models)
+    return isinstance(obj, models)
+
+
+def _pending(session):
+    return session.info.setdefault('cache_changes', [])
+
+
+def _record(session, obj):
+    watched = False
+    for models, _, shared in _watchers:
+        if _matches(obj, models):
+            watched = True
+            if callable(shared):
+                shared = shared(session, obj)
+            if shared and not session.info.get('generation_bumped'):
+                session.info['generation_bumped'] = True
+                _bump(session.connection())
+    if watched:
+        _pending(session).append(obj)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        _record(session, obj)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        _record(orm_execute_state.session, mapper.class_)
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_changes(session):
+    global _seen_generation
+    changed = session.info.pop('cache_changes', None)
+    bumped = session.info.pop('generation_bumped', False)
+    if not changed:
+        return
+    if bumped:
+        invalidate_all()
+        _seen_generation = _STALE
+    for models, callback, _ in _watchers:
+        hits = [obj for obj in changed if _matches(obj, models)]
+        if hits and callback:
+            callback(hits)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_changes(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('cache_changes', None)
+        session.info.pop('generation_bumped', None)
+
+
+def _generation_table():
+    from app.models import CacheGeneration
+    return CacheGeneration.__table__
+
+
+def _bump(connection):
+    table = _generation_table()
+    result = connection.execute(
+        table.update()
+        .where(table.c.name == GENERATION_NAME)
+        .values(value=table.c.value + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(name=GENERATION_NAME, value=1))
+
+
+def bump_generation():
+    """بالا بردن دستی شمارنده (مثلاً بعد از تغییر مستقیم با SQL)"""
+    from app import db
+    _bump(db.session.connection())
+    db.session.commit()
+    invalidate_all()
+
+
+def read_generation():
+    from app import db
+    table = _generation_table()
+    return db.session.execute(
+        table.select().with_only_columns(table.c.value).where(table.c.name == GENERATION_NAME)
+    ).scalar()
+
+
+def check_generation():
+    """اگر worker دیگه‌ای داده‌های مشترک رو تغییر داده، کش‌های محلی پاک می‌شن"""
+    global _seen_generation
+    current = read_generation()
+    if current != _seen_generation:
+        if _seen_generation is not None:
+            invalidate_all()
+        _seen_generation = current
+
+
+def init_app(app):
+    from app import db
+    with app.app_context():
+        _generation_table().create(db.engine, checkfirst=True)
+
+    if app.config.get('CACHE_GENERATION_CHECK', True):
+        app.before_request(check_generation)
@@ -0,0 +1,108 @@
+# app/database.py
+"""
+پروفایل اتصال دیتابیس.
+
+آدرس دیتابیس از DATABASE_URL (یا SQLALCHEMY_DATABASE_URI در محیط) خونده
+می‌شه و پیش‌فرض همون SQLite داخل instance است. بسته به درایور:
+
+SQLite (DB_PROFILE='tuned'، پیش‌فرض) - روی هر اتصال جدید:
+    journal_mode=WAL       خواننده‌ها پشت نویسنده منتظر نمی‌مونن
+    busy_timeout           به جای خطای "database is locked" صبر می‌کنه
+    synchronous=NORMAL     در WAL امن است و fsync کمتری داره
+    mmap_size, cache_size  خواندن سریع‌تر
+DB_PROFILE='plain' هیچ PRAGMA‌ای نمی‌زنه (رفتار قبلی، برای مقایسه در
+scripts/bench_db.py).
+
+دیتابیس سرور (PostgreSQL/MySQL): اندازه pool از DB_POOL_SIZE و
+DB_MAX_OVERFLOW، به همراه pool_pre_ping و pool_recycle.
+"""
+import logging
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+# PRAGMAهایی که روی اتصال فقط خواندنی (replica) هم معنی دارن
+READ_PRAGMAS = ('cache_size', 'mmap_size', 'temp_store')
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS مناسب درایور (قبل از db.init_app)"""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+
+    if is_sqlite(uri):
+        if config.get('DB_PROFILE', 'tuned') == 'plain':
+            return options
+        connect_args = dict(options.get('connect_args') or {})
+        # timeout درایور sqlite3 همون busy_timeout است (به ثانیه)
+        connect_args.setdefault('timeout', config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000)
+        connect_args.setdefault('check_same_thread', False)
+        options['connect_args'] = connect_args
+        if make_url(uri).database in (None, '', ':memory:'):
+            return options
+        # هر thread یک اتصال؛ بیشتر از تعداد threadهای worker لازم نیست
+        options.setdefault('pool_size', config.get('DB_POOL_SIZE', 10))
+        options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+        return options
+
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE', 10))
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+    options.setdefault('pool_pre_ping', True)
+    return options
+
+
+def sqlite_pragmas(config):
+    """[(نام PRAGMA, مقدار)] برای هر اتصال SQLite"""
+    if config.get('DB_PROFILE', 'tuned') == 'plain':
+        return []
+    pragmas = [
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('cache_size', int(config.get('SQLITE_CACHE_SIZE', -64000))),
+        ('mmap_size', int(config.get('SQLITE_MMAP_SIZE', 268435456))),
+        ('temp_store', 'MEMORY'),
+    ]
+    if config.get('SQLITE_WAL', True):
+        pragmas.insert(0, ('journal_mode', 'WAL'))
+    return pragmas
+
+
+def _pragma_listener(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def configure(app):
+    """تنظیم گزینه‌های engine؛ باید قبل از db.init_app صدا زده بشه"""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def init_app(app):
+    """PRAGMAهای SQLite روی همه engineها (اصلی و bindها)"""
+    from app import db
+    pragmas = sqlite_pragmas(app.config)
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            if engine.dialect.name != 'sqlite' or not pragmas:
+                continue
+            if bind == 'replica':
+                # کپی فقط خواندنی؛ PRAGMAهای نوشتن روش خطا می‌دن
+                engine_pragmas = [(name, value) for name, value in pragmas if name in READ_PRAGMAS]
+            else:
+                engine_pragmas = pragmas
+            event.listen(engine, 'connect', _pragma_listener(engine_pragmas))
+            pragmas_text = ', '.join(f'{name}={value}' for name, value in engine_pragmas)
+            logger.info('پروفایل SQLite برای %s: %s', bind or 'default', pragmas_text)
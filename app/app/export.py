@@ -0,0 +1,114 @@
+# app/export.py
+"""
+خروجی گرفتن از پاسخ‌های فرم (CSV و JSONL) به صورت stream.
+
+پاسخ‌ها دسته‌ای (به ترتیب id) خونده و بلافاصله نوشته می‌شن؛ حافظه مصرفی
+به اندازه یک دسته است و به تعداد کل پاسخ‌ها بستگی نداره.
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+from app import db
+from app.models import FormResponse, ResponseCell, User
+
+BATCH_SIZE = 1000
+
+ExportRow = namedtuple('ExportRow', ['id', 'user_id', 'username', 'filled_at', 'data'])
+
+
+def export_columns(structure):
+    """[(کلید خانه, عنوان ستون خروجی)] به ترتیب سطر و ستون"""
+    columns = structure.get('columns', []) if isinstance(structure, dict) else []
+    rows = structure.get('rows', 0) if isinstance(structure, dict) else 0
+    return [
+        (f'cell_{row}_{col}', f"{column.get('name') or col + 1} [{row + 1}]")
+        for row in range(rows)
+        for col, column in enumerate(columns)
+    ]
+
+
+def _cells_by_response(response_ids):
+    """پاسخ‌هایی که فقط در response_cell ذخیره شدن (RESPONSE_STORAGE='cells')"""
+    data = {}
+    if not response_ids:
+        return data
+    rows = (db.session.query(ResponseCell.response_id, ResponseCell.row,
+                             ResponseCell.col, ResponseCell.text_value)
+            .filter(ResponseCell.response_id.in_(response_ids))
+            .all())
+    for response_id, row, col, value in rows:
+        data.setdefault(response_id, {})[f'cell_{row}_{col}'] = value
+    return data
+
+
+def iter_responses(form_id, after_id=0, batch_size=BATCH_SIZE):
+    """ExportRow برای همه پاسخ‌های فرم با id بزرگ‌تر از after_id، به ترتیب id"""
+    last_id = after_id
+    while True:
+        batch = (db.session.query(FormResponse.id, FormResponse.user_id, User.username,
+                                  FormResponse.filled_at, FormResponse.responses)
+                 # پاسخ کاربر حذف شده هم خروجی می‌گیره (با نام کاربری خالی)
+                 .outerjoin(User, User.id == FormResponse.user_id)
+                 .filter(FormResponse.form_id == form_id, FormResponse.id > last_id)
+                 .order_by(FormResponse.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            return
+
+        cells = _cells_by_response([row.id for row in batch if not row.responses])
+        for response_id, user_id, username, filled_at, blob in batch:
+            if blob:
+                try:
+                    data = json.loads(blob)
+                except ValueError:
+                    data = {}
+            else:
+                data = cells.get(response_id, {})
+            yield ExportRow(response_id, user_id, username or '', filled_at, data)
+
+        last_id = batch[-1].id
+
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+def stream_csv(form_id, structure):
+    columns = export_columns(structure)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    # BOM برای نمایش درست فارسی در Excel
+    buffer.write('\ufeff')
+    writer.writerow(['response_id', 'username', 'filled_at'] + [title for _, title in columns])
+    yield flush()
+
+    for count, row in enumerate(iter_responses(form_id), 1):
+        writer.writerow([row.id, row.username, _format_time(row.filled_at)]
+                        + [row.data.get(key, '') for key, _ in columns])
+        if count % 100 == 0:
+            yield flush()
+    yield flush()
+
+
+def stream_jsonl(form_id, structure):
+    keys = [key for key, _ in export_columns(structure)]
+    lines = []
+    for row in iter_responses(form_id):
+        record = {'response_id': row.id, 'username': row.username, 'filled_at': _format_time(row.filled_at)}
+        for key in keys:
+            record[key] = row.data.get(key, '')
+        lines.append(json.dumps(record, ensure_ascii=False))
+        if len(lines) >= 100:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
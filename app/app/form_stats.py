@@ -0,0 +1,271 @@
+# app/form_stats.py
+"""
+آمار تجمعی هر فرم (تعداد پرشده، جمع/میانگین/کمینه/بیشینه ستون‌های عددی،
+توزیع گزینه‌ها و تعداد تیک‌خورده‌ها) که با هر پاسخ جدید به صورت افزایشی
+به‌روز می‌شه؛ خلاصه فرم بدون توجه به تعداد پاسخ‌ها در O(ستون‌ها) خونده می‌شه.
+
+آمار افزایشی فقط روی فرمی درست است که یک بار از روی همه پاسخ‌هاش ساخته
+شده باشه (ردیف نشانه BUILT). فرم جدید در همون تراکنش ساختش با
+start_form_stats نشانه می‌گیره و فرم‌های موجود با migration شماره 8؛ اگر آمار خاموش بوده و پاسخ ثبت
+شده، نشانه حذف می‌شه و با scripts/rebuild_form_stats.py دوباره ساخته می‌شه.
+"""
+import json
+from sqlalchemy import case, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import FormResponse, FormStat, ResponseCell
+from app.responses import parse_cell_key
+
+WHOLE = -1  # row/col = -1 یعنی کل ستون / کل فرم
+BUILT = -2  # row = col = -2: نشانه «آمار از روی همه پاسخ‌ها ساخته شده»
+CHOICE_TYPES = ('select', 'radio', 'checkbox')
+
+_table = FormStat.__table__
+
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def compute_deltas(structure, data_list):
+    """
+    تغییرات آمار برای چند پاسخ:
+    {(row, col, bucket): [count, total, min, max]}
+    """
+    columns = structure.get('columns', []) if isinstance(structure, dict) else []
+    deltas = {}
+
+    def add(key, number=None):
+        entry = deltas.get(key)
+        if entry is None:
+            entry = deltas[key] = [0, 0.0, None, None]
+        entry[0] += 1
+        if number is not None:
+            entry[1] += number
+            entry[2] = number if entry[2] is None else min(entry[2], number)
+            entry[3] = number if entry[3] is None else max(entry[3], number)
+
+    for data in data_list:
+        add((WHOLE, WHOLE, ''))
+        for key, value in data.items():
+            position = parse_cell_key(key)
+            if position is None or value in (None, ''):
+                continue
+            row, col = position
+            col_type = columns[col].get('type') if col < len(columns) else 'text'
+            number = _to_number(value) if col_type == 'number' else None
+            for target_row in (row, WHOLE):
+                add((target_row, col, ''), number)
+                if col_type in CHOICE_TYPES:
+                    add((target_row, col, str(value)[:200]))
+    return deltas
+
+
+def _merged(existing, incoming, pick):
+    return case(
+        (existing.is_(None), incoming),
+        (incoming.is_(None), existing),
+        else_=pick(existing, incoming),
+    )
+
+
+def _dialect_name(conn):
+    return (conn.dialect if conn is not None else db.session.get_bind().dialect).name
+
+
+def apply_deltas(form_id, deltas, conn=None):
+    """
+    اعمال تغییرات با افزایش اتمیک (بدون خواندن و نوشتن مجدد در پایتون)؛
+    conn برای اجرا بیرون از session (migrationها)
+    """
+    if not deltas:
+        return
+    executor = conn if conn is not None else db.session
+    params = [
+        {'form_id': form_id, 'row': row, 'col': col, 'bucket': bucket,
+         'count': count, 'total': total, 'min_value': minimum, 'max_value': maximum}
+        for (row, col, bucket), (count, total, minimum, maximum) in deltas.items()
+    ]
+
+    dialect = _dialect_name(conn)
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['form_id', 'row', 'col', 'bucket'],
+            set_={
+                'count': _table.c.count + stmt.excluded.count,
+                'total': _table.c.total + stmt.excluded.total,
+                'min_value': _merged(_table.c.min_value, stmt.excluded.min_value,
+                                     lambda a, b: case((b < a, b), else_=a)),
+                'max_value': _merged(_table.c.max_value, stmt.excluded.max_value,
+                                     lambda a, b: case((b > a, b), else_=a)),
+            }
+        )
+        executor.execute(stmt, params)
+        return
+
+    # سایر دیتابیس‌ها: اول update، اگر ردیفی نبود insert
+    for item in params:
+        values = {'count': _table.c.count + item['count'], 'total': _table.c.total + item['total']}
+        if item['min_value'] is not None:
+            values['min_value'] = case((_table.c.min_value.is_(None), item['min_value']),
+                                       (_table.c.min_value > item['min_value'], item['min_value']),
+                                       else_=_table.c.min_value)
+            values['max_value'] = case((_table.c.max_value.is_(None), item['max_value']),
+                                       (_table.c.max_value < item['max_value'], item['max_value']),
+                                       else_=_table.c.max_value)
+        result = executor.execute(
+            _table.update()
+            .where(_table.c.form_id == item['form_id'], _table.c.row == item['row'],
+                   _table.c.col == item['col'], _table.c.bucket == item['bucket'])
+            .values(**values)
+        )
+        if result.rowcount == 0:
+            executor.execute(_table.insert().values(**item))
+
+
+def is_built(form_id, conn=None):
+    executor = conn if conn is not None else db.session
+    return executor.execute(
+        select(_table.c.id).where(_table.c.form_id == form_id, _table.c.row == BUILT,
+                                  _table.c.col == BUILT)
+    ).first() is not None
+
+
+def record_responses(form_id, structure, data_list):
+    """
+    به‌روزرسانی آمار برای پاسخ‌های جدید؛ در همون تراکنش ثبت پاسخ.
+    فرمی که هنوز ساخته نشده دست نمی‌خوره (پاسخ‌های قبلیش شمرده نشدن)
+    """
+    if is_built(form_id):
+        apply_deltas(form_id, compute_deltas(structure, data_list))
+
+
+def invalidate(form_id, conn=None):
+    """حذف آمار و نشانه ساخت فرم (وقتی پاسخی بدون به‌روزرسانی آمار ثبت شده)"""
+    executor = conn if conn is not None else db.session
+    executor.execute(_table.delete().where(_table.c.form_id == form_id))
+
+
+def _mark_built(form_id, conn=None):
+    executor = conn if conn is not None else db.session
+    executor.execute(_table.insert().values(form_id=form_id, row=BUILT, col=BUILT, bucket='',
+                                            count=0, total=0))
+
+
+def start_form_stats(form_id):
+    """آمار خالی و نشانه BUILT برای فرم تازه ساخته شده (بدون پاسخ)؛ در همون تراکنش ساخت فرم"""
+    apply_deltas(form_id, {(WHOLE, WHOLE, ''): [0, 0.0, None, None]})
+    _mark_built(form_id)
+
+
+def _response_batches(executor, form_id, batch_size):
+    """dict پاسخ‌های فرم، دسته به دسته به ترتیب id (JSON یا جدول response_cell)"""
+    responses = FormResponse.__table__
+    cells = ResponseCell.__table__
+    last_id = 0
+    while True:
+        rows = executor.execute(
+            select(responses.c.id, responses.c.responses)
+            .where(responses.c.form_id == form_id, responses.c.id > last_id)
+            .order_by(responses.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        # در حالت RESPONSE_STORAGE='cells' متن JSON خالی است
+        cell_data = {}
+        missing = [response_id for response_id, text in rows if not text]
+        if missing:
+            for response_id, row, col, value in executor.execute(
+                    select(cells.c.response_id, cells.c.row, cells.c.col, cells.c.text_value)
+                    .where(cells.c.response_id.in_(missing))):
+                cell_data.setdefault(response_id, {})[f'cell_{row}_{col}'] = value
+
+        data_list = []
+        for response_id, text in rows:
+            if not text:
+                data_list.append(cell_data.get(response_id, {}))
+                continue
+            try:
+                data_list.append(json.loads(text))
+            except ValueError:
+                continue
+        yield data_list
+        last_id = rows[-1][0]
+
+
+def rebuild_form_stats(form_id, structure, batch_size=1000, conn=None):
+    """
+    محاسبه دوباره آمار از روی همه پاسخ‌ها و گذاشتن نشانه BUILT؛
+    commit با صدا زننده است (conn برای migrationها)
+    """
+    executor = conn if conn is not None else db.session
+    # حذف اول انجام می‌شه تا در SQLite قفل نوشتن از همین ابتدا گرفته بشه
+    invalidate(form_id, conn)
+    apply_deltas(form_id, {(WHOLE, WHOLE, ''): [0, 0.0, None, None]}, conn)
+    for data_list in _response_batches(executor, form_id, batch_size):
+        apply_deltas(form_id, compute_deltas(structure, data_list), conn)
+    _mark_built(form_id, conn)
+
+
+def _stat_dict(stat):
+    result = {'count': stat.count}
+    if stat.min_value is not None:
+        result.update({
+            'sum': stat.total,
+            'avg': stat.total / stat.count if stat.count else None,
+            'min': stat.min_value,
+            'max': stat.max_value,
+        })
+    return result
+
+
+def form_summary(form_id, structure, include_cells=False):
+    """
+    خلاصه آمار فرم:
+    {'responses': N, 'columns': [...], 'cells': {'<row>_<col>': {...}}}
+    """
+    query = FormStat.query.filter_by(form_id=form_id)
+    if not include_cells:
+        query = query.filter(FormStat.row.in_((WHOLE, BUILT)))
+    stats = query.all()
+
+    columns = structure.get('columns', []) if isinstance(structure, dict) else []
+    summary = {
+        'built': False,
+        'responses': 0,
+        'columns': [
+            {'index': i, 'name': col.get('name'), 'type': col.get('type'), 'filled': 0, 'options': {}}
+            for i, col in enumerate(columns)
+        ],
+    }
+    cells = {}
+
+    for stat in stats:
+        if stat.row == BUILT:
+            summary['built'] = True
+            continue
+        if stat.col == WHOLE:
+            summary['responses'] = stat.count
+            continue
+        if stat.row == WHOLE:
+            if stat.col >= len(columns):
+                continue
+            target = summary['columns'][stat.col]
+        else:
+            target = cells.setdefault(f'{stat.row}_{stat.col}', {'filled': 0, 'options': {}})
+        if stat.bucket:
+            target['options'][stat.bucket] = stat.count
+        else:
+            values = _stat_dict(stat)
+            target['filled'] = values.pop('count')
+            target.update(values)
+
+    if include_cells:
+        summary['cells'] = cells
+    return summary
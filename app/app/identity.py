@@ -0,0 +1,104 @@
+# app/identity.py
+"""لود کاربر جاری در هر درخواست: یک کوئری join شده + کش کوتاه‌مدت اختیاری"""
+from sqlalchemy import inspect
+from sqlalchemy.orm import contains_eager, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.cache import LocalCache, on_commit_change
+from app.models import User, Role, Permission
+from app.permissions import prime_role_permissions
+
+# user_id -> (ستون‌های کاربر, ستون‌های نقش)
+# فقط وقتی USER_CACHE_TTL بیشتر از صفر باشه استفاده می‌شه
+_identities = LocalCache('identities', ttl=0)
+
+
+def _columns(obj):
+    return {c.key: getattr(obj, c.key) for c in obj.__table__.columns}
+
+
+def _detached(model, columns):
+    """ساخت آبجکت persistent از مقادیر کش شده، بدون کوئری"""
+    obj = model(**columns)
+    make_transient_to_detached(obj)
+    return obj
+
+
+def query_user(user_id):
+    """کاربر، نقش و نام دسترسی‌های نقش در یک کوئری"""
+    rows = (db.session.query(User, Permission.name)
+            .outerjoin(User.role)
+            .outerjoin(Permission, Permission.role_id == User.role_id)
+            .options(contains_eager(User.role))
+            .filter(User.id == user_id)
+            .all())
+    if not rows:
+        return None
+    user = rows[0][0]
+    if user.role is not None:
+        prime_role_permissions(user.role_id, user.role.name,
+                               [name for _, name in rows if name])
+    return user
+
+
+def load_user(user_id):
+    if not _identities.ttl:
+        return query_user(user_id)
+
+    cached = _identities.get(user_id)
+    if cached is not None:
+        user_columns, role_columns = cached
+        user = _detached(User, user_columns)
+        role = _detached(Role, role_columns) if role_columns else None
+        set_committed_value(user, 'role', role)
+        return db.session.merge(user, load=False)
+
+    user = query_user(user_id)
+    if user is not None:
+        _identities.set(user_id, (_columns(user), _columns(user.role) if user.role else None))
+    return user
+
+
+def forget_users(changed):
+    """حذف کاربرهای ویرایش/حذف شده از کش همین پردازه"""
+    for obj in changed:
+        if isinstance(obj, User):
+            _identities.pop(obj.id)
+        else:
+            # تغییر گروهی (query.update/delete)؛ کاربرهاش معلوم نیستن
+            _identities.clear()
+            return
+
+
+def user_change_is_shared(session, obj):
+    """
+    حذف کاربر یا تغییر نقش و رمزش باید به همه workerها برسه؛ بقیه تغییرها
+    (نام، موبایل، هش دوباره رمز موقع ورود) فقط کش همین پردازه رو پاک می‌کنن
+    """
+    if isinstance(obj, type):
+        # update/delete گروهی؛ معلوم نیست چی عوض شده
+        return True
+    if obj in session.new:
+        return False
+    if obj in session.deleted:
+        return True
+    attrs = inspect(obj).attrs
+    if attrs.role_id.history.has_changes():
+        return True
+    return (attrs.password_hash.history.has_changes()
+            and obj.password_hash != getattr(obj, '_rehashed_hash', None))
+
+
+def forget_roles(changed):
+    _identities.clear()
+
+
+def init_app(app):
+    _identities.ttl = app.config.get('USER_CACHE_TTL', 0)
+
+
+# بالا بردن شمارنده مشترک همه کش‌های همه workerها رو پاک می‌کنه؛ برای
+# تغییرهای بی‌خطر کاربر workerهای دیگه حداکثر تا USER_CACHE_TTL ثانیه
+# کاربر قبلی رو می‌بینن. نقش و دسترسی همیشه مشترک هستن.
+on_commit_change((User,), forget_users, shared=user_change_is_shared)
+on_commit_change((Role, Permission), forget_roles, shared=True)
@@ -0,0 +1,228 @@
+# app/importer.py
+"""
+ورود دسته‌ای پاسخ‌ها از فایل CSV یا JSONL (برای فرم‌هایی که آفلاین پر شدن).
+
+ستون‌های فایل همون ستون‌های خروجی app/export.py هستن:
+    - کلید خانه (cell_<row>_<col>) یا عنوان خروجی ("نام ستون [شماره سطر]")
+    - username و filled_at اختیاری؛ response_id نادیده گرفته می‌شه
+
+هر ردیف با ساختار فرم (نوع ستون، required، گزینه‌های select/radio) چک
+می‌شه. ردیف‌های سالم دسته‌ای و در یک تراکنش برای هر دسته ثبت می‌شن؛
+خطای یک ردیف فقط همون ردیف رو رد می‌کنه.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from app import db
+from app.models import User
+from app.export import export_columns
+from app.responses import create_form_responses, parse_cell_key
+from app.structures import get_form_structure
+
+BATCH_SIZE = 500
+META_FIELDS = ('response_id', 'username', 'filled_at')
+CHECKBOX_VALUES = {'true': 'true', '1': 'true', 'false': '', '0': '', '': ''}
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []  # [(شماره خط, [پیام‌ها])]
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    def add_error(self, line, messages):
+        self.errors.append((line, messages if isinstance(messages, list) else [messages]))
+
+
+def _cell_label(structure, row, col):
+    return f"{structure.columns[col].get('name') or col + 1} [{row + 1}]"
+
+
+def _parse_time(value):
+    value = (value or '').strip()
+    if not value:
+        return None
+    for parse in (lambda v: datetime.strptime(v, '%Y-%m-%d %H:%M:%S'), datetime.fromisoformat):
+        try:
+            return parse(value)
+        except ValueError:
+            continue
+    raise ValueError(f'زمان ثبت نامعتبر: {value}')
+
+
+def validate_row(structure, values):
+    """
+    چک کردن یک ردیف با ساختار فرم (FormStructure از app/structures.py).
+    values: {cell_<row>_<col>: مقدار}؛ خروجی (data تمیز شده, لیست خطاها)
+    """
+    data = {}
+    errors = []
+
+    for key in values:
+        position = parse_cell_key(key)
+        if position is None or position[0] >= structure.rows or position[1] >= len(structure.columns):
+            errors.append(f'ستون ناشناخته: {key}')
+
+    for row, keys in enumerate(structure.cell_keys):
+        for col, key in enumerate(keys):
+            if not structure.editable[col]:
+                # مثل صفحه پر کردن: مقدار ستون‌های غیرقابل ویرایش از پیش‌فرض فرم میاد
+                data[key] = structure.default_value(row, col)
+                continue
+
+            value = values.get(key)
+            value = '' if value is None else str(value).strip()
+            col_type = structure.column_types[col]
+
+            if col_type == 'checkbox':
+                if value.lower() not in CHECKBOX_VALUES:
+                    errors.append(f'{_cell_label(structure, row, col)}: مقدار تیک نامعتبر ({value})')
+                elif CHECKBOX_VALUES[value.lower()]:
+                    # تیک نخورده در فرم اصلاً ارسال نمی‌شه
+                    data[key] = 'true'
+                continue
+
+            if value == '':
+                if structure.required[col]:
+                    errors.append(f'{_cell_label(structure, row, col)}: الزامی است')
+                data[key] = ''
+                continue
+
+            error = None
+            if col_type == 'number':
+                try:
+                    float(value)
+                except ValueError:
+                    error = 'عدد نامعتبر'
+            elif col_type == 'date':
+                try:
+                    date.fromisoformat(value)
+                except ValueError:
+                    error = 'تاریخ نامعتبر'
+            elif col_type in ('select', 'radio'):
+                if value not in structure.option_sets[col]:
+                    error = 'گزینه نامعتبر'
+            if error:
+                errors.append(f'{_cell_label(structure, row, col)}: {error} ({value})')
+            data[key] = value
+
+    return data, errors
+
+
+def _header_keys(structure, header):
+    """نگاشت سرستون‌های فایل به کلید خانه‌ها"""
+    titles = {title: key for key, title in export_columns(structure)}
+    keys = []
+    for name in header:
+        name = (name or '').strip().lstrip('\ufeff')
+        if name in META_FIELDS or parse_cell_key(name):
+            keys.append(name)
+        else:
+            keys.append(titles.get(name, name))
+    return keys
+
+
+def read_csv(stream, structure):
+    """(شماره خط, dict) برای هر ردیف CSV"""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    keys = _header_keys(structure, header)
+    for values in reader:
+        if not any(values):
+            continue
+        yield reader.line_num, dict(zip(keys, values))
+
+
+def read_jsonl(stream, structure):
+    """(شماره خط, dict) برای هر خط JSONL؛ برای خط خراب None"""
+    for line_num, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_num, None
+            continue
+        if not isinstance(record, dict):
+            yield line_num, None
+            continue
+        keys = _header_keys(structure, record.keys())
+        yield line_num, dict(zip(keys, record.values()))
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def open_text(file_storage):
+    """فایل آپلود شده -> stream متنی utf-8 (با BOM یا بدون)"""
+    return io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+
+
+def import_responses(form, records, default_user_id, batch_size=BATCH_SIZE):
+    """
+    ثبت ردیف‌های (شماره خط, dict) به صورت دسته‌ای؛ ImportResult برمی‌گردونه.
+    هر دسته یک تراکنش است؛ اگر ثبت یک دسته شکست بخوره فقط ردیف‌های همون
+    دسته خطا می‌گیرن.
+    """
+    structure = get_form_structure(form)
+    result = ImportResult()
+    user_ids = {}
+    batch = []
+
+    def user_id_for(username):
+        if username not in user_ids:
+            user = db.session.query(User.id).filter_by(username=username).first()
+            user_ids[username] = user.id if user else None
+        return user_ids[username]
+
+    def flush():
+        try:
+            create_form_responses(form, [item for _, item in batch], structure.data)
+            db.session.commit()
+            result.imported += len(batch)
+        except Exception as e:
+            db.session.rollback()
+            for line, _ in batch:
+                result.add_error(line, f'خطای ثبت در دیتابیس: {e}')
+        batch.clear()
+
+    for line, record in records:
+        if record is None:
+            result.add_error(line, 'JSON نامعتبر')
+            continue
+
+        values = {key: value for key, value in record.items() if key not in META_FIELDS}
+        data, errors = validate_row(structure, values)
+
+        user_id = default_user_id
+        username = str(record.get('username') or '').strip()
+        if username:
+            user_id = user_id_for(username)
+            if user_id is None:
+                errors.append(f'کاربر ناشناخته: {username}')
+        try:
+            filled_at = _parse_time(record.get('filled_at'))
+        except ValueError as e:
+            errors.append(str(e))
+
+        if errors:
+            result.add_error(line, errors)
+            continue
+
+        batch.append((line, (user_id, data, filled_at)))
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    return result
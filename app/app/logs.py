@@ -0,0 +1,231 @@
+# app/logs.py
+"""
+لاگ ساخت‌یافته و بدون بلاک شدن درخواست‌ها.
+
+همه لاگ‌ها از طریق یک QueueHandler وارد صف می‌شن و یک thread پس‌زمینه
+(QueueListener) اون‌ها رو فرمت کرده و در stdout / فایل می‌نویسه؛ thread
+درخواست هیچ وقت منتظر I/O نمی‌مونه. اگر صف پر باشه لاگ دور ریخته می‌شه
+(و در /metrics به اسم putapp_log_dropped_total شمرده می‌شه) به جای اینکه
+درخواست معطل بمونه.
+
+    logger = logging.getLogger(__name__)
+    logger.info('فرم %s ثبت شد', form.id, extra={'form_id': form.id})
+
+- پیام («%s») فقط برای لاگ‌هایی که از سطح و نمونه‌برداری رد می‌شن ساخته می‌شه،
+  در همون thread و قبل از صف؛ ساختن JSON و نوشتن در thread پس‌زمینه است
+- سطح هر logger جدا: LOG_LEVELS="app.routes.form=DEBUG,sqlalchemy.engine=WARNING"
+- نمونه‌برداری برای رویدادهای پرتعداد: LOG_SAMPLING="app.routes.form.fill=0.1"
+  یا برای یک پیام خاص extra={'sample_rate': 0.01}
+- خروجی: LOG_FORMAT='json' (هر خط یک JSON) یا 'text'
+"""
+import atexit
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from flask import has_request_context, request
+
+# فیلدهای استاندارد LogRecord؛ بقیه از extra اومدن و در خروجی نوشته می‌شن
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_handler = None
+_exception_formatter = logging.Formatter()
+# thread موقتاً متوقف شده (pause)
+_paused = False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler که هیچ وقت بلاک نمی‌شه"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record):
+        # مثل QueueHandler اصلی پیام همین‌جا ثابت می‌شه: args ممکنه بعداً عوض
+        # بشن یا آبجکت ORM/درخواستی باشن که از thread دیگه نباید لمس بشن.
+        # کپی، چون handlerهای دیگه همین رکورد رو با args اصلی می‌بینن
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        if has_request_context():
+            record.endpoint = request.endpoint
+            record.path = request.path
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """
+    نگه داشتن بخشی از لاگ‌های پرتعداد (مثلاً ۰.۱ یعنی از هر ۱۰ تا یکی).
+    WARNING و بالاتر همیشه نگه داشته می‌شن.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _rate_for(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        if rate is not None:
+            return rate
+        name = record.name
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record)
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        key = (record.name, record.msg)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = itertools.count()
+            return next(counter) % round(1 / rate) == 0
+
+
+class StructuredFormatter(logging.Formatter):
+    """هر رکورد -> یک خط JSON، یا متن ساده با key=value برای فیلدهای extra"""
+
+    def __init__(self, fmt='json'):
+        super().__init__()
+        self.json = fmt == 'json'
+
+    def format(self, record):
+        message = record.getMessage()
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+        fields.pop('sample_rate', None)
+        timestamp = datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds')
+
+        # رکوردهای صف، traceback رو از قبل به صورت متن دارن (exc_text)
+        exc = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+
+        if self.json:
+            entry = {'ts': timestamp, 'level': record.levelname, 'logger': record.name, 'msg': message}
+            entry.update(fields)
+            if exc:
+                entry['exc'] = exc
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+        line = f'{timestamp} {record.levelname} {record.name}: {message}'
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        if exc:
+            line += '\n' + exc
+        return line
+
+
+def parse_levels(text):
+    """'app.routes=DEBUG,sqlalchemy.engine=WARNING' -> {name: level}"""
+    levels = {}
+    for item in (text or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def parse_rates(text):
+    """'app.routes.form.fill=0.1' -> {name: 0.1}"""
+    return {name: float(rate) for name, rate in parse_levels(text).items()}
+
+
+def dropped_count():
+    return _handler.dropped if _handler is not None else 0
+
+
+def _collect_metrics(prefix):
+    return [
+        f'# HELP {prefix}_log_dropped_total Log records dropped because the log queue was full.',
+        f'# TYPE {prefix}_log_dropped_total counter',
+        f'{prefix}_log_dropped_total {dropped_count()}',
+    ]
+
+
+def stop():
+    """خالی کردن صف و توقف thread (در خروج پردازه)"""
+    global _listener, _paused
+    if _listener is not None:
+        if not _paused:
+            _listener.stop()
+        _listener = None
+        _paused = False
+
+
+def pause():
+    """توقف موقت thread قبل از fork (serve.py)؛ بعدش در هر دو پردازه resume"""
+    global _paused
+    if _listener is not None and not _paused:
+        _listener.stop()
+        _paused = True
+
+
+def resume():
+    global _paused
+    if _listener is not None and _paused:
+        _listener.start()
+        _paused = False
+
+
+def init_app(app):
+    """راه‌اندازی لاگ برای root logger؛ چند بار صدا زدن فقط تنظیمات رو تازه می‌کنه"""
+    global _listener, _handler
+    config = app.config
+
+    output_handlers = [logging.StreamHandler(sys.stdout)]
+    if config.get('LOG_FILE'):
+        output_handlers.append(logging.handlers.WatchedFileHandler(config['LOG_FILE'], encoding='utf-8'))
+    formatter = StructuredFormatter(config.get('LOG_FORMAT', 'json'))
+    for handler in output_handlers:
+        handler.setFormatter(formatter)
+
+    stop()
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=config.get('LOG_QUEUE_SIZE', 10000)))
+    _handler.addFilter(SamplingFilter(parse_rates(config.get('LOG_SAMPLING'))))
+    root.addHandler(_handler)
+    root.setLevel(config.get('LOG_LEVEL', 'INFO'))
+    for name, level in parse_levels(config.get('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level)
+
+    # app.logger فلسک خودش به stderr هم می‌نویسه؛ فقط از مسیر صف بره
+    from flask.logging import default_handler
+    app.logger.removeHandler(default_handler)
+
+    _listener = logging.handlers.QueueListener(_handler.queue, *output_handlers, respect_handler_level=True)
+    _listener.start()
+
+    from app import metrics
+    metrics.register_collector(_collect_metrics)
+
+
+atexit.register(stop)
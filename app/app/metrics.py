@@ -0,0 +1,246 @@
+# app/metrics.py
+"""
+زمان پاسخ و شمارنده‌های هر endpoint، با خروجی Prometheus در /metrics.
+
+برای هر endpoint (blueprint.view):
+    - هیستوگرام زمان پاسخ (bucketهای ثابت)
+    - تعداد پاسخ‌ها بر اساس method و status
+    - تعداد درخواست‌های در حال اجرا (gauge)
+    - زمان صرف شده در دیتابیس (برای نسبت زمان دیتابیس به کل)
+و برای راحتی، p50/p95/p99 تخمینی از روی هیستوگرام.
+
+آمار مال همین پردازه است؛ با چند worker هر کدوم /metrics خودش رو داره
+(Prometheus برچسب instance رو جدا نگه می‌داره و با sum جمع می‌شه).
+دسترسی به /metrics: هدر Authorization: Bearer <METRICS_TOKEN> یا کاربر ادمین.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, current_app, g, request
+from flask_login import current_user
+from sqlalchemy import event
+
+PREFIX = 'putapp'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # آخری = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """تخمین quantile با درون‌یابی خطی در bucket (مثل histogram_quantile)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[i - 1] if i else 0.0
+                return lower + (BUCKETS[i] - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-1]
+
+
+class EndpointMetrics:
+    __slots__ = ('latency', 'db_time', 'in_flight', 'statuses')
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.db_time = 0.0
+        self.in_flight = 0
+        self.statuses = {}  # (method, status) -> تعداد
+
+
+_endpoints = {}
+_lock = threading.Lock()
+
+# توابعی که خطوط Prometheus بقیه ماژول‌ها رو می‌دن (مثلاً app/ratelimit.py)
+_collectors = []
+
+
+def register_collector(func):
+    """func(prefix) -> لیست خطوط؛ به انتهای خروجی /metrics اضافه می‌شن"""
+    if func not in _collectors:
+        _collectors.append(func)
+
+
+def _metrics_for(endpoint):
+    metrics = _endpoints.get(endpoint)
+    if metrics is None:
+        metrics = _endpoints[endpoint] = EndpointMetrics()
+    return metrics
+
+
+def _endpoint_name():
+    return request.endpoint or 'unmatched'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metrics_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_metrics_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    try:
+        g._metrics_db_time = g.get('_metrics_db_time', 0.0) + elapsed
+    except RuntimeError:
+        # بیرون از context درخواست (اسکریپت‌ها)
+        pass
+
+
+def _start_request():
+    endpoint = _endpoint_name()
+    if endpoint == 'metrics':
+        return
+    g._metrics_start = time.perf_counter()
+    g._metrics_db_time = 0.0
+    with _lock:
+        _metrics_for(endpoint).in_flight += 1
+
+
+def _capture_status(response):
+    g._metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    start = g.pop('_metrics_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    status = g.pop('_metrics_status', 500 if exc is not None else 200)
+    key = (request.method, str(status))
+    with _lock:
+        metrics = _metrics_for(_endpoint_name())
+        metrics.in_flight -= 1
+        metrics.latency.observe(elapsed)
+        metrics.db_time += g.pop('_metrics_db_time', 0.0)
+        metrics.statuses[key] = metrics.statuses.get(key, 0) + 1
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def render_prometheus():
+    """همه آمار در قالب متنی Prometheus (text/plain; version=0.0.4)"""
+    with _lock:
+        snapshot = [(endpoint, m.latency.counts[:], m.latency.sum, m.latency.count,
+                     m.db_time, m.in_flight, dict(m.statuses))
+                    for endpoint, m in sorted(_endpoints.items())]
+
+    lines = [
+        f'# HELP {PREFIX}_request_duration_seconds Request latency per endpoint.',
+        f'# TYPE {PREFIX}_request_duration_seconds histogram',
+    ]
+    for endpoint, counts, total, count, _, _, _ in snapshot:
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + ('+Inf',), counts):
+            cumulative += bucket_count
+            lines.append(f'{PREFIX}_request_duration_seconds_bucket'
+                         f'{_labels(endpoint=endpoint, le=bound)} {cumulative}')
+        lines.append(f'{PREFIX}_request_duration_seconds_sum{_labels(endpoint=endpoint)} {total:.6f}')
+        lines.append(f'{PREFIX}_request_duration_seconds_count{_labels(endpoint=endpoint)} {count}')
+
+    lines += [
+        f'# HELP {PREFIX}_request_duration_estimate_seconds Latency quantiles estimated from the histogram.',
+        f'# TYPE {PREFIX}_request_duration_estimate_seconds gauge',
+    ]
+    for endpoint, counts, total, count, _, _, _ in snapshot:
+        histogram = Histogram()
+        histogram.counts, histogram.count = counts, count
+        for q in QUANTILES:
+            value = histogram.quantile(q)
+            if value is not None:
+                lines.append(f'{PREFIX}_request_duration_estimate_seconds'
+                             f'{_labels(endpoint=endpoint, quantile=q)} {value:.6f}')
+
+    lines += [
+        f'# HELP {PREFIX}_responses_total Responses per endpoint, method and status code.',
+        f'# TYPE {PREFIX}_responses_total counter',
+    ]
+    for endpoint, _, _, _, _, _, statuses in snapshot:
+        for (method, status), count in sorted(statuses.items()):
+            lines.append(f'{PREFIX}_responses_total'
+                         f'{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+    lines += [
+        f'# HELP {PREFIX}_requests_in_flight Requests currently being handled.',
+        f'# TYPE {PREFIX}_requests_in_flight gauge',
+    ]
+    for endpoint, _, _, _, _, in_flight, _ in snapshot:
+        lines.append(f'{PREFIX}_requests_in_flight{_labels(endpoint=endpoint)} {in_flight}')
+
+    lines += [
+        f'# HELP {PREFIX}_db_time_seconds_total Time spent in database calls per endpoint.',
+        f'# TYPE {PREFIX}_db_time_seconds_total counter',
+    ]
+    for endpoint, _, _, _, db_time, _, _ in snapshot:
+        lines.append(f'{PREFIX}_db_time_seconds_total{_labels(endpoint=endpoint)} {db_time:.6f}')
+
+    lines += [
+        f'# HELP {PREFIX}_db_time_fraction Share of request time spent in the database.',
+        f'# TYPE {PREFIX}_db_time_fraction gauge',
+    ]
+    for endpoint, _, total, _, db_time, _, _ in snapshot:
+        if total:
+            lines.append(f'{PREFIX}_db_time_fraction{_labels(endpoint=endpoint)} {db_time / total:.4f}')
+
+    for collector in _collectors:
+        lines += collector(PREFIX)
+
+    return '\n'.join(lines) + '\n'
+
+
+def _authorized():
+    token = current_app.config.get('METRICS_TOKEN')
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer ') and hmac.compare_digest(header[7:].encode(), token.encode()):
+        return True
+    return current_user.is_authenticated and current_user.is_admin()
+
+
+def metrics_view():
+    if not _authorized():
+        return Response('forbidden\n', status=403, mimetype='text/plain')
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
+
+
+def init_app(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    from app import db
+    with app.app_context():
+        engines = list(db.engines.values())
+    # همه engineها (اصلی و bindهایی مثل replica)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    # زمان‌سنجی قبل از بقیه before_requestها شروع می‌شه
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_capture_status)
+    app.teardown_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
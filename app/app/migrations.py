@@ -0,0 +1,463 @@
+# app/migrations.py
+"""
+migrationهای نسخه‌دار دیتابیس.
+
+هر migration یک شماره نسخه، upgrade و (در صورت امکان) downgrade داره و
+نسخه‌های اجرا شده در جدول schema_migration ثبت می‌شن. اجرا از طریق
+scripts/migrate.py:
+
+    python scripts/migrate.py status
+    python scripts/migrate.py upgrade              # تا آخرین نسخه
+    python scripts/migrate.py downgrade --to 2
+
+migration معمولی در یک تراکنش اجرا می‌شه (با خطا هیچ چیزش نمی‌مونه).
+migrationهای online (ساخت ایندکس) بدون تراکنش اجرا می‌شن تا جدول در طول
+ساخت قفل نمونه؛ هر قدمشون تکرارپذیر است و اگر وسط کار قطع بشه، اجرای
+دوباره از همون‌جا ادامه می‌ده:
+    PostgreSQL   CREATE INDEX CONCURRENTLY
+    MySQL        ALGORITHM=INPLACE, LOCK=NONE
+    SQLite       CREATE INDEX IF NOT EXISTS (در WAL خواننده‌ها منتظر نمی‌مونن)
+ساخت CONCURRENTLY ناموفق در PostgreSQL یک ایندکس INVALID جا می‌ذاره؛ اون
+ایندکس ساخته نشده حساب می‌شه و در اجرای دوباره حذف و از نو ساخته می‌شه.
+
+migrationها جدول‌ها رو با DDL ثابت خودشون می‌سازن، نه از روی app/models.py؛
+وگرنه با هر تغییر مدل، معنی یک نسخه قدیمی هم عوض می‌شه.
+
+دیتابیس جدید که با db.create_all ساخته می‌شه همه چیز رو از روی مدل‌ها
+داره و فقط stamp می‌شه (scripts/init_db.py).
+"""
+import json
+import logging
+from datetime import datetime
+from sqlalchemy import (Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData,
+                        String, Table, Text, UniqueConstraint, inspect, text)
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    def __init__(self, version, name, upgrade, downgrade=None, online=False):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+        self.downgrade = downgrade
+        self.online = online
+
+    def __repr__(self):
+        return f'<Migration {self.version} {self.name}>'
+
+
+def migration(version, name, online=False):
+    """ثبت تابع upgrade؛ downgrade با @<تابع>.downgrade_with"""
+    def register(upgrade):
+        item = Migration(version, name, upgrade, online=online)
+        if any(m.version == version for m in MIGRATIONS):
+            raise MigrationError(f'نسخه تکراری: {version}')
+        MIGRATIONS.append(item)
+        MIGRATIONS.sort(key=lambda m: m.version)
+
+        def downgrade_with(func):
+            item.downgrade = func
+            return func
+        upgrade.downgrade_with = downgrade_with
+        return upgrade
+    return register
+
+
+# ---------- کمک‌تابع‌ها ----------
+
+def _index_state(conn, table, name):
+    """None اگر ایندکس نباشه، True اگر سالم باشه، False برای ایندکس INVALID در PostgreSQL"""
+    if conn.dialect.name == 'postgresql':
+        return conn.execute(text(
+            'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE c.relname = :name AND pg_table_is_visible(c.oid)'), {'name': name}).scalar()
+    if any(ix['name'] == name for ix in inspect(conn).get_indexes(table)):
+        return True
+    return None
+
+
+def has_index(conn, table, name):
+    return _index_state(conn, table, name) is True
+
+
+def create_index(conn, name, table, columns):
+    """ساخت ایندکس بدون قفل طولانی؛ اگر از قبل (سالم) باشه کاری نمی‌کنه"""
+    state = _index_state(conn, table, name)
+    if state:
+        return False
+    cols = ', '.join(columns)
+    dialect = conn.dialect.name
+    if state is False:
+        # باقی‌مانده CREATE INDEX CONCURRENTLY ناموفق؛ IF NOT EXISTS ازش رد می‌شد
+        logger.warning('ایندکس %s معتبر نیست (INVALID)؛ حذف و ساخت دوباره', name)
+        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+    if dialect == 'postgresql':
+        sql = f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON "{table}" ({cols})'
+    elif dialect in ('mysql', 'mariadb'):
+        sql = f'CREATE INDEX {name} ON `{table}` ({cols}) ALGORITHM=INPLACE LOCK=NONE'
+    else:
+        sql = f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({cols})'
+    conn.execute(text(sql))
+    logger.info('ایندکس %s روی %s(%s) ساخته شد', name, table, cols)
+    return True
+
+
+def drop_index(conn, name, table):
+    if _index_state(conn, table, name) is None:
+        return False
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        sql = f'DROP INDEX CONCURRENTLY IF EXISTS {name}'
+    elif dialect in ('mysql', 'mariadb'):
+        sql = f'DROP INDEX {name} ON `{table}`'
+    else:
+        sql = f'DROP INDEX IF EXISTS {name}'
+    conn.execute(text(sql))
+    logger.info('ایندکس %s حذف شد', name)
+    return True
+
+
+# ---------- migrationها ----------
+
+def _initial_tables():
+    """
+    اسکیمای قبل از migrationهای نسخه‌دار: جدول‌های اولیه برنامه به علاوه
+    response_cell، form_stat و cache_generation که قبل از این سیستم اضافه
+    شدن. ثابت است؛ تغییرهای بعدی مدل‌ها migration خودشون رو دارن.
+    """
+    metadata = MetaData()
+    Table('role', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(50), nullable=False, unique=True),
+          Column('description', String(200)),
+          Column('created_at', DateTime))
+    Table('permission', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(100), nullable=False, unique=True),
+          Column('description', String(200)),
+          Column('role_id', Integer, ForeignKey('role.id'), nullable=False),
+          Column('created_at', DateTime))
+    Table('organization', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(100), nullable=False, unique=True))
+    Table('area', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(100), nullable=False),
+          Column('organization_id', Integer, ForeignKey('organization.id'), nullable=False))
+    Table('position', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(100), nullable=False))
+    Table('user', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('username', String(80), nullable=False, unique=True),
+          Column('name', String(100), nullable=False),
+          Column('password_hash', String(200), nullable=False),
+          Column('mobile', String(11), nullable=False),
+          Column('organization_id', Integer, ForeignKey('organization.id')),
+          Column('area_id', Integer, ForeignKey('area.id')),
+          Column('position', String(50)),
+          Column('role_id', Integer, ForeignKey('role.id'), nullable=False),
+          Column('created_at', DateTime))
+    Table('form', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('title', String(200), nullable=False),
+          Column('structure', Text, nullable=False),
+          Column('created_by', Integer, ForeignKey('user.id')),
+          Column('created_at', DateTime))
+    Table('form_response', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('form_id', Integer, ForeignKey('form.id'), nullable=False),
+          Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+          Column('responses', Text),
+          Column('filled_at', DateTime))
+    Table('user_permission', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+          Column('form_id', Integer, ForeignKey('form.id'), nullable=False),
+          Column('can_view', Boolean),
+          Column('can_fill', Boolean),
+          Column('can_edit', Boolean),
+          Column('can_delete', Boolean))
+    Table('form_access', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('form_id', Integer, ForeignKey('form.id')),
+          Column('access_type', String(20)),
+          Column('target_id', Integer),
+          Column('permissions', String(100)),
+          Column('created_at', DateTime))
+    Table('response_cell', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('response_id', Integer, ForeignKey('form_response.id'), nullable=False),
+          Column('form_id', Integer, ForeignKey('form.id'), nullable=False),
+          Column('row', Integer, nullable=False),
+          Column('col', Integer, nullable=False),
+          Column('num_value', Float),
+          Column('date_value', Date),
+          Column('text_value', Text),
+          Index('ix_response_cell_response_id', 'response_id'),
+          Index('ix_response_cell_form_col', 'form_id', 'col'))
+    Table('form_stat', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('form_id', Integer, ForeignKey('form.id'), nullable=False),
+          Column('row', Integer, nullable=False),
+          Column('col', Integer, nullable=False),
+          Column('bucket', String(200), nullable=False),
+          Column('count', Integer, nullable=False),
+          Column('total', Float, nullable=False),
+          Column('min_value', Float),
+          Column('max_value', Float),
+          UniqueConstraint('form_id', 'row', 'col', 'bucket', name='uq_form_stat_cell'))
+    Table('cache_generation', metadata,
+          Column('name', String(50), primary_key=True),
+          Column('value', Integer, nullable=False))
+    return metadata
+
+
+@migration(1, 'initial_schema')
+def initial_schema(conn):
+    # جدول‌هایی که از قبل هستن (دیتابیس‌های قدیمی) دست نمی‌خورن
+    _initial_tables().create_all(conn, checkfirst=True)
+
+
+@migration(2, 'backfill_user_role')
+def backfill_user_role(conn):
+    # جایگزین scripts/migration_script.py که بی‌حساب role_id = 1 می‌ذاشت؛
+    # فقط کاربرهای بدون نقش، و فقط به نقش 'user' اگر وجود داشته باشه
+    role_id = conn.execute(text("SELECT id FROM role WHERE name = 'user'")).scalar()
+    if role_id is None:
+        logger.warning('نقش user وجود نداره؛ کاربرهای بدون نقش دست نخوردن')
+        return
+    result = conn.execute(text('UPDATE "user" SET role_id = :role_id WHERE role_id IS NULL'),
+                          {'role_id': role_id})
+    logger.info('%d کاربر بدون نقش به نقش user وصل شدن', result.rowcount)
+
+
+@backfill_user_role.downgrade_with
+def backfill_user_role_down(conn):
+    # کاربر بدون نقش اصلاً معتبر نبود؛ برگرداندنش معنی نداره
+    pass
+
+
+HOT_PATH_INDEXES = (
+    # (نام، جدول، ستون‌ها)
+    ('ix_form_response_form_filled_at', 'form_response', ('form_id', 'filled_at', 'id')),
+    ('ix_form_response_user_id', 'form_response', ('user_id',)),
+    ('ix_form_response_filled_at_id', 'form_response', ('filled_at', 'id')),
+    ('ix_form_created_by', 'form', ('created_by',)),
+    ('ix_form_access_lookup', 'form_access', ('form_id', 'access_type', 'target_id')),
+)
+
+
+@migration(3, 'hot_path_indexes', online=True)
+def hot_path_indexes(conn):
+    for name, table, columns in HOT_PATH_INDEXES:
+        create_index(conn, name, table, columns)
+
+
+@hot_path_indexes.downgrade_with
+def hot_path_indexes_down(conn):
+    for name, table, _ in reversed(HOT_PATH_INDEXES):
+        drop_index(conn, name, table)
+
+
+def has_column(conn, table, name):
+    return any(col['name'] == name for col in inspect(conn).get_columns(table))
+
+
+# بیت‌های app/access.py؛ اینجا ثابت نوشته شدن تا migration با تغییر کد عوض نشه
+_BITS = {'view': 1, 'fill': 2, 'edit': 4, 'delete': 8, 'manage': 16, 'full': 31}
+
+
+@migration(4, 'form_access_bits')
+def form_access_bits(conn):
+    if not has_column(conn, 'form_access', 'permission_bits'):
+        conn.execute(text('ALTER TABLE form_access ADD COLUMN permission_bits INTEGER NOT NULL DEFAULT 0'))
+
+    # رشته 'view,fill' -> بیت
+    rows = conn.execute(text('SELECT id, permissions FROM form_access')).all()
+    for access_id, permissions in rows:
+        bits = 0
+        for name in (permissions or '').split(','):
+            bits |= _BITS.get(name.strip().lower(), 0)
+        conn.execute(text('UPDATE form_access SET permission_bits = :bits WHERE id = :id'),
+                     {'bits': bits, 'id': access_id})
+
+    # جدول قدیمی user_permission -> grant نوع 'user' (با grant موجود OR می‌شه)
+    if not inspect(conn).has_table('user_permission'):
+        return
+    legacy = conn.execute(text(
+        'SELECT user_id, form_id, can_view, can_fill, can_edit, can_delete FROM user_permission')).all()
+    for user_id, form_id, can_view, can_fill, can_edit, can_delete in legacy:
+        bits = ((_BITS['view'] if can_view else 0) | (_BITS['fill'] if can_fill else 0)
+                | (_BITS['edit'] if can_edit else 0) | (_BITS['delete'] if can_delete else 0))
+        if not bits:
+            continue
+        existing = conn.execute(text(
+            "SELECT id, permission_bits FROM form_access "
+            "WHERE form_id = :form_id AND access_type = 'user' AND target_id = :user_id"),
+            {'form_id': form_id, 'user_id': user_id}).first()
+        if existing:
+            conn.execute(text('UPDATE form_access SET permission_bits = :bits WHERE id = :id'),
+                         {'bits': existing.permission_bits | bits, 'id': existing.id})
+        else:
+            names = ','.join(name for name in ('view', 'fill', 'edit', 'delete') if bits & _BITS[name])
+            conn.execute(text(
+                "INSERT INTO form_access (form_id, access_type, target_id, permissions, permission_bits, created_at) "
+                "VALUES (:form_id, 'user', :user_id, :names, :bits, :now)"),
+                {'form_id': form_id, 'user_id': user_id, 'names': names, 'bits': bits, 'now': datetime.utcnow()})
+    logger.info('%d ردیف user_permission به form_access منتقل شد', len(legacy))
+
+
+@form_access_bits.downgrade_with
+def form_access_bits_down(conn):
+    # ستون متنی permissions همیشه هم‌زمان نوشته می‌شه؛ فقط ستون عددی حذف می‌شه
+    # (grantهای منتقل شده از user_permission در form_access می‌مونن)
+    if has_column(conn, 'form_access', 'permission_bits'):
+        conn.execute(text('ALTER TABLE form_access DROP COLUMN permission_bits'))
+
+
+@migration(5, 'form_access_target_index', online=True)
+def form_access_target_index(conn):
+    create_index(conn, 'ix_form_access_target_bits', 'form_access',
+                 ('access_type', 'target_id', 'permission_bits', 'form_id'))
+
+
+@form_access_target_index.downgrade_with
+def form_access_target_index_down(conn):
+    drop_index(conn, 'ix_form_access_target_bits', 'form_access')
+
+
+@migration(6, 'search_index')
+def search_index(conn):
+    # search_entry (+ search_fts روی SQLite) و پر کردنش از داده‌های موجود (app/search.py)
+    from app import search
+    search.setup(conn)
+    logger.info('%d ردیف در ایندکس جستجو', search.rebuild(conn))
+
+
+@search_index.downgrade_with
+def search_index_down(conn):
+    from app import search
+    search.drop(conn)
+
+
+@migration(7, 'login_attempt')
+def login_attempt(conn):
+    # جدول تلاش‌های ورود برای LOGIN_LIMIT_BACKEND = 'database' (app/ratelimit.py)
+    from app.models import LoginAttempt
+    LoginAttempt.__table__.create(conn, checkfirst=True)
+
+
+@login_attempt.downgrade_with
+def login_attempt_down(conn):
+    from app.models import LoginAttempt
+    LoginAttempt.__table__.drop(conn, checkfirst=True)
+
+
+@migration(8, 'form_stats_built')
+def form_stats_built(conn):
+    # آمار فرم‌های موجود از روی همه پاسخ‌ها؛ قبلاً با اولین پاسخ بعد از استقرار
+    # ردیف کل فرم ساخته می‌شد و پاسخ‌های قدیمی هیچ‌وقت شمرده نمی‌شدن
+    from app import form_stats
+    forms = conn.execute(text('SELECT id, structure FROM form ORDER BY id')).all()
+    for form_id, structure in forms:
+        try:
+            structure = json.loads(structure) if structure else {}
+        except ValueError:
+            structure = {}
+        form_stats.rebuild_form_stats(form_id, structure, conn=conn)
+    logger.info('آمار %d فرم ساخته شد', len(forms))
+
+
+@form_stats_built.downgrade_with
+def form_stats_built_down(conn):
+    from app.form_stats import BUILT
+    conn.execute(text('DELETE FROM form_stat WHERE "row" = :built AND col = :built'), {'built': BUILT})
+
+
+# ---------- اجرا ----------
+
+def _version_table(engine):
+    from app.models import SchemaMigration
+    table = SchemaMigration.__table__
+    table.create(engine, checkfirst=True)
+    return table
+
+
+def applied_versions(engine):
+    table = _version_table(engine)
+    with engine.connect() as conn:
+        return {row.version: row for row in conn.execute(table.select())}
+
+
+def head():
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def current_version(engine):
+    return max(applied_versions(engine), default=0)
+
+
+def _run(engine, migration, func):
+    if migration.online:
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            func(conn)
+    else:
+        with engine.begin() as conn:
+            func(conn)
+
+
+def upgrade(engine, target=None):
+    """اجرای migrationهای اجرا نشده تا target؛ برگرداندن لیست اجرا شده‌ها"""
+    table = _version_table(engine)
+    applied = applied_versions(engine)
+    target = head() if target is None else target
+    done = []
+    for item in MIGRATIONS:
+        if item.version > target or item.version in applied:
+            continue
+        logger.info('upgrade %s: %s', item.version, item.name)
+        _run(engine, item, item.upgrade)
+        with engine.begin() as conn:
+            conn.execute(table.insert().values(version=item.version, name=item.name,
+                                               applied_at=datetime.utcnow()))
+        done.append(item)
+    return done
+
+
+def downgrade(engine, target):
+    """برگرداندن migrationهای بالاتر از target، از آخر به اول"""
+    table = _version_table(engine)
+    applied = applied_versions(engine)
+    steps = [m for m in reversed(MIGRATIONS) if m.version > target and m.version in applied]
+    # قبل از شروع؛ نه اینکه نصفه برگرده و وسط کار خطا بده
+    for item in steps:
+        if item.downgrade is None:
+            raise MigrationError(f'migration {item.version} ({item.name}) برگشت‌پذیر نیست')
+    done = []
+    for item in steps:
+        logger.info('downgrade %s: %s', item.version, item.name)
+        _run(engine, item, item.downgrade)
+        with engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.version == item.version))
+        done.append(item)
+    return done
+
+
+def stamp(engine, target=None):
+    """ثبت نسخه‌ها بدون اجرا (برای دیتابیسی که با create_all ساخته شده)"""
+    table = _version_table(engine)
+    applied = applied_versions(engine)
+    target = head() if target is None else target
+    with engine.begin() as conn:
+        for item in MIGRATIONS:
+            if item.version <= target and item.version not in applied:
+                conn.execute(table.insert().values(version=item.version, name=item.name,
+                                                   applied_at=datetime.utcnow()))
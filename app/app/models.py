@@ -1,7 +1,6 @@
 # app/models.py
 from app import db, login_manager
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 import json
 from datetime import datetime
 
@@ -41,21 +40,30 @@ class User(UserMixin, db.Model):
     organization = db.relationship('Organization', backref='users', lazy=True)
     area = db.relationship('Area', backref='users', lazy=True)
 
+    # هش در process pool و با روش تنظیم شده (app/passwords.py)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from app.passwords import hash_password
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        from app.passwords import verify_password
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        from app.passwords import needs_rehash
+        return needs_rehash(self.password_hash)
+
+    def rehash_password(self, password):
+        """هش دوباره همون رمز با تنظیمات فعلی (موقع ورود)؛ کش بقیه workerها دست نمی‌خوره (app/identity.py)"""
+        self.set_password(password)
+        self._rehashed_hash = self.password_hash
 
     # 🔥 متدهای جدید برای دسترسی‌ها
     def has_permission(self, permission_name):
         """بررسی آیا کاربر دسترسی خاصی دارد"""
-        # ادمین به همه چیز دسترسی داره
-        if self.role.name == 'admin':
-            return True
-        
-        # بررسی دسترسی در نقش کاربر
-        return any(perm.name == permission_name for perm in self.role.permissions)
+        # دسترسی‌های نقش یک بار کامپایل و کش می‌شه (app/permissions.py)
+        from app.permissions import get_role_permissions
+        return get_role_permissions(self.role_id).allows(permission_name)
 
     def can_create_user(self): return self.has_permission('user.create')
     def can_edit_user(self): return self.has_permission('user.edit')
@@ -79,7 +87,9 @@ class User(UserMixin, db.Model):
 # مدل‌های موجود (بدون تغییر)
 @login_manager.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    # کاربر + نقش + دسترسی‌ها در یک کوئری، با کش اختیاری (app/identity.py)
+    from app.identity import load_user as load_identity
+    return load_identity(int(id))
 
 class Organization(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -100,12 +110,14 @@ class Form(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     structure = db.Column(db.Text, nullable=False)  # JSON با ساختار جدید
-    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     creator = db.relationship('User', backref='forms', lazy=True)
     
     def get_structure(self):
-        return json.loads(self.structure) if self.structure else []
+        # parse شده و کش شده بر اساس hash ساختار (app/structures.py)؛ فقط خواندنی
+        from app.structures import get_form_structure
+        return get_form_structure(self).data
     
     accesses = db.relationship('FormAccess', backref='form', lazy=True, cascade='all, delete-orphan')
 
@@ -113,9 +125,16 @@ class Form(db.Model):
 
 
 class FormResponse(db.Model):
+    # ایندکس برای صفحه‌بندی keyset روی (filled_at, id)، کل و برای هر فرم
+    # (ایندکس‌ها در دیتابیس‌های موجود با scripts/migrate.py ساخته می‌شن)
+    __table_args__ = (
+        db.Index('ix_form_response_filled_at_id', 'filled_at', 'id'),
+        db.Index('ix_form_response_form_filled_at', 'form_id', 'filled_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     form_id = db.Column(db.Integer, db.ForeignKey('form.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     responses = db.Column(db.Text)  # ذخیره پاسخ‌ها به صورت JSON
     filled_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -123,6 +142,56 @@ class FormResponse(db.Model):
     form = db.relationship('Form', backref=db.backref('form_responses', lazy=True))
     user = db.relationship('User', backref=db.backref('form_responses', lazy=True))
 
+    def get_data(self):
+        """پاسخ‌ها به صورت dict با کلیدهای cell_<row>_<col>"""
+        if self.responses:
+            return json.loads(self.responses)
+        # در حالت RESPONSE_STORAGE='cells' فقط جدول response_cell پر می‌شه
+        from app.responses import cells_to_data
+        return cells_to_data(self.id)
+
+
+class ResponseCell(db.Model):
+    """مقدار تایپ‌دار هر خانه از پاسخ؛ برای فیلتر و جمع‌زدن در خود SQL"""
+    __tablename__ = 'response_cell'
+    __table_args__ = (
+        db.Index('ix_response_cell_form_col', 'form_id', 'col'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('form_response.id'), nullable=False, index=True)
+    form_id = db.Column(db.Integer, db.ForeignKey('form.id'), nullable=False)
+    row = db.Column(db.Integer, nullable=False)
+    col = db.Column(db.Integer, nullable=False)
+    num_value = db.Column(db.Float)  # number و checkbox (۱ یا ۰)
+    date_value = db.Column(db.Date)
+    text_value = db.Column(db.Text)
+
+    response = db.relationship('FormResponse', backref=db.backref('cells', lazy=True, cascade='all, delete-orphan'))
+
+class FormStat(db.Model):
+    """
+    آمار تجمعی پاسخ‌های یک فرم که با هر ثبت پاسخ به‌روز می‌شه (app/form_stats.py).
+    row=-1 یعنی کل ستون، col=-1 یعنی کل فرم؛ bucket برای گزینه‌های
+    select/radio/checkbox مقدار گزینه و برای بقیه رشته خالی است.
+    """
+    __tablename__ = 'form_stat'
+    __table_args__ = (
+        db.UniqueConstraint('form_id', 'row', 'col', 'bucket', name='uq_form_stat_cell'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    form_id = db.Column(db.Integer, db.ForeignKey('form.id'), nullable=False)
+    row = db.Column(db.Integer, nullable=False)
+    col = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.String(200), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+    min_value = db.Column(db.Float)
+    max_value = db.Column(db.Float)
+
+
+# قدیمی؛ داده‌هاش با migration شماره 4 به FormAccess (نوع 'user') منتقل شده
 class UserPermission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -135,12 +204,64 @@ class UserPermission(db.Model):
 
 
 class FormAccess(db.Model):
+    # همه کوئری‌های دسترسی روی (فرم، نوع، کاربر/نقش) فیلتر می‌کنن؛ دومی برای
+    # «فرم‌هایی که این کاربر/نقش بهشون دسترسی داره» بدون خواندن خود جدول (app/access.py)
+    __table_args__ = (
+        db.Index('ix_form_access_lookup', 'form_id', 'access_type', 'target_id'),
+        db.Index('ix_form_access_target_bits', 'access_type', 'target_id', 'permission_bits', 'form_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     form_id = db.Column(db.Integer, db.ForeignKey('form.id'))
     access_type = db.Column(db.String(20))  # 'user' یا 'role'
     target_id = db.Column(db.Integer)  # user_id یا role_id
-    permissions = db.Column(db.String(100))  # 'view,fill,edit' یا 'full'
+    permissions = db.Column(db.String(100))  # 'view,fill,edit' یا 'full' (فقط نمایش)
+    permission_bits = db.Column(db.Integer, nullable=False, default=0)  # VIEW|FILL|... از app/access.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
         return f'<FormAccess {self.id}>'
+
+
+class CacheGeneration(db.Model):
+    """شمارنده نسل کش‌ها؛ هر تغییر در داده‌های دسترسی یک واحد بالا می‌برش (app/cache.py)"""
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SchemaMigration(db.Model):
+    """تاریخچه migrationهای اجرا شده (app/migrations.py)"""
+    __tablename__ = 'schema_migration'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SearchEntry(db.Model):
+    """
+    متن نرمال شده هر فرم (عنوان) و هر پاسخ (مقادیر متنی) برای جستجو (app/search.py).
+    روی SQLite جدول FTS5 به اسم search_fts از روی همین جدول با trigger پر می‌شه.
+    """
+    __tablename__ = 'search_entry'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'ref_id', name='uq_search_entry_ref'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # 'form' یا 'response'
+    ref_id = db.Column(db.Integer, nullable=False)
+    form_id = db.Column(db.Integer, nullable=False, index=True)
+    body = db.Column(db.Text, nullable=False, default='')
+
+
+class LoginAttempt(db.Model):
+    """تلاش‌های ورود اخیر، وقتی محدودیت ورود بین workerها مشترک است (app/ratelimit.py)"""
+    __tablename__ = 'login_attempt'
+    __table_args__ = (
+        db.Index('ix_login_attempt_key_time', 'key', 'attempted_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(200), nullable=False)
+    attempted_at = db.Column(db.Float, nullable=False, index=True)  # زمان یونیکس
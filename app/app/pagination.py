@@ -0,0 +1,108 @@
+# app/pagination.py
+"""صفحه‌بندی keyset (cursor): هزینه صفحه‌های عمیق هم مثل صفحه اول است"""
+from datetime import datetime
+from sqlalchemy import tuple_
+from app.cache import LocalCache
+
+# تعداد کل ردیف‌ها برای هر محدوده، با انقضای کوتاه
+_counts = LocalCache('row_counts')
+
+
+class KeysetPage:
+    """یک صفحه از نتایج + cursor صفحه‌های قبلی و بعدی"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values):
+    return '_'.join(_encode_value(v) for v in values)
+
+
+def decode_cursor(cursor, columns):
+    """تبدیل cursor متنی به مقادیر؛ cursor خراب یعنی صفحه اول"""
+    if not cursor:
+        return None
+    parts = cursor.split('_')
+    if len(parts) != len(columns):
+        return None
+    values = []
+    try:
+        for part, column in zip(parts, columns):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                values.append(datetime.fromisoformat(part))
+            else:
+                values.append(python_type(part))
+    except (ValueError, NotImplementedError):
+        return None
+    return values
+
+
+def keyset_paginate(query, columns, after=None, before=None, per_page=15):
+    """
+    صفحه‌بندی نزولی روی columns (مثلاً filled_at, id).
+    after: cursor آخرین ردیف صفحه قبل (رفتن به صفحه بعد)
+    before: cursor اولین ردیف صفحه بعد (برگشتن به صفحه قبل)
+    ستون آخر باید یکتا باشد (معمولاً id) تا ترتیب کامل باشد.
+    """
+    key = tuple_(*columns)
+    after_values = decode_cursor(after, columns)
+    before_values = decode_cursor(before, columns)
+
+    if before_values is not None:
+        # برعکس می‌خونیم و بعد ترتیب رو درست می‌کنیم
+        rows = (query.filter(key > tuple_(*before_values))
+                .order_by(*[c.asc() for c in columns])
+                .limit(per_page + 1)
+                .all())
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        prev_cursor = _cursor_of(items[0], columns) if has_more and items else None
+        next_cursor = _cursor_of(items[-1], columns) if items else None
+        return KeysetPage(items, next_cursor, prev_cursor)
+
+    if after_values is not None:
+        query = query.filter(key < tuple_(*after_values))
+    rows = (query.order_by(*[c.desc() for c in columns])
+            .limit(per_page + 1)
+            .all())
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    next_cursor = _cursor_of(items[-1], columns) if has_more else None
+    prev_cursor = _cursor_of(items[0], columns) if after_values is not None and items else None
+    return KeysetPage(items, next_cursor, prev_cursor)
+
+
+def _cursor_of(item, columns):
+    return encode_cursor(getattr(item, c.key) for c in columns)
+
+
+def cached_count(key, query, ttl):
+    """
+    تعداد تقریبی ردیف‌ها: هر ttl ثانیه یک بار count واقعی گرفته می‌شه.
+    ttl صفر یعنی همیشه شمارش دقیق.
+    """
+    if not ttl:
+        return query.order_by(None).count()
+    count = _counts.get(key)
+    if count is None:
+        count = query.order_by(None).count()
+        _counts.set(key, count, ttl=ttl)
+    return count
@@ -0,0 +1,179 @@
+# app/passwords.py
+"""
+هش و بررسی رمز عبور در یک process pool محدود، بیرون از thread درخواست.
+
+KDF (scrypt / pbkdf2) عمداً سنگین است؛ اگر صدها ورود هم‌زمان (اول شیفت)
+هر کدوم در thread خودشون هش کنن همه هسته‌ها پر می‌شن و بقیه درخواست‌ها
+معطل می‌مونن. اینجا حداکثر PASSWORD_HASH_WORKERS هش هم‌زمان اجرا می‌شه و
+حداکثر PASSWORD_HASH_QUEUE درخواست منتظر می‌مونه؛ بیشتر از اون
+HashingBusy می‌ده (صفحه ورود پیغام «دوباره تلاش کنید» نشون می‌ده).
+
+    PASSWORD_HASH_METHOD   روش werkzeug با پارامترها، مثلاً 'scrypt:32768:8:1'
+                           یا 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS  تعداد پردازه‌ها؛ 0 یعنی همون thread (توسعه/اسکریپت‌ها)
+
+هش‌های قدیمی (روش یا پارامتر متفاوت) بعد از ورود موفق با تنظیمات فعلی
+دوباره ساخته می‌شن (needs_rehash).
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusy(Exception):
+    """صف هش پر است"""
+
+
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def _verify(stored, password):
+    return check_password_hash(stored, password)
+
+
+def _warm_up(_):
+    return os.getpid()
+
+
+def _init_worker(parent_pid):
+    # Ctrl+C فقط برای پردازه اصلی؛ اگر پردازه اصلی بدون shutdown بمیره (SIGTERM/kill)
+    # pool خودش خارج می‌شه و سوکت‌ها و فایل‌های به ارث برده رو نگه نمی‌داره
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', salt_length=16, workers=0, queue_size=64, timeout=30):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size) if workers else None
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._method_prefix = None
+
+    # ---------- pool ----------
+
+    def _get_pool(self):
+        # بعد از fork شدن خود برنامه (چند worker) pool پردازه پدر قابل استفاده نیست
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    # با fork پردازه‌ها فایل اصلی (run.py و اسکریپت‌ها) رو دوباره اجرا نمی‌کنن؛
+                    # پردازه‌ها فقط تابع هش رو اجرا می‌کنن و به lockهای بقیه threadها کاری ندارن
+                    methods = multiprocessing.get_all_start_methods()
+                    context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                     initializer=_init_worker, initargs=(os.getpid(),))
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _discard(self, pool):
+        """کنار گذاشتن pool خراب (مثلاً پردازه‌ای kill شده)؛ دفعه بعد از نو ساخته می‌شه"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        # صف پر: بلافاصله «مشغول»، نه معطل نگه داشتن thread درخواست
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            for attempt in range(2):
+                pool = self._get_pool()
+                try:
+                    return pool.submit(func, *args).result(timeout=self.timeout)
+                except BrokenProcessPool:
+                    logger.warning('pool هش رمز خراب شد؛ از نو ساخته می‌شه')
+                    self._discard(pool)
+                except FutureTimeout:
+                    raise HashingBusy()
+            logger.error('pool هش رمز بعد از ساخت دوباره هم خراب است')
+            raise HashingBusy()
+        finally:
+            self._slots.release()
+
+    def start(self):
+        """ساختن پردازه‌ها از قبل، تا اولین ورودها منتظر راه‌اندازی نمونن"""
+        if self.workers:
+            pool = self._get_pool()
+            list(pool.map(_warm_up, range(self.workers)))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # ---------- هش ----------
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method, self.salt_length)
+
+    def verify(self, stored, password):
+        if not stored:
+            return False
+        return self._run(_verify, stored, password)
+
+    def method_prefix(self):
+        """روش کامل با پارامترها، همون‌طور که در ابتدای هش ذخیره می‌شه"""
+        if self._method_prefix is None:
+            self._method_prefix = _hash('', self.method, 1).split('$', 1)[0]
+        return self._method_prefix
+
+    def needs_rehash(self, stored):
+        return not stored or stored.split('$', 1)[0] != self.method_prefix()
+
+
+_hasher = PasswordHasher()
+
+
+def get_hasher():
+    return _hasher
+
+
+def hash_password(password):
+    return _hasher.hash(password)
+
+
+def verify_password(stored, password):
+    return _hasher.verify(stored, password)
+
+
+def needs_rehash(stored):
+    return _hasher.needs_rehash(stored)
+
+
+def init_app(app):
+    global _hasher
+    config = app.config
+    _hasher.shutdown()
+    _hasher = PasswordHasher(
+        method=config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        salt_length=config.get('PASSWORD_SALT_LENGTH', 16),
+        workers=config.get('PASSWORD_HASH_WORKERS', 0),
+        queue_size=config.get('PASSWORD_HASH_QUEUE', 64),
+        timeout=config.get('PASSWORD_HASH_TIMEOUT', 30),
+    )
+    if _hasher.workers:
+        logger.info('هش رمز در %d پردازه (%s)', _hasher.workers, _hasher.method)
@@ -0,0 +1,65 @@
+# app/permissions.py
+"""دسترسی‌های کامپایل شده هر نقش (یک کوئری برای هر نقش در هر پردازه)"""
+from collections import namedtuple
+from flask import g, has_app_context
+from app import db
+from app.cache import LocalCache, on_commit_change
+from app.models import Role, Permission, FormAccess, UserPermission
+
+_role_permissions = LocalCache('role_permissions')
+
+
+class RolePermissions(namedtuple('RolePermissions', ['role_name', 'names'])):
+    """نام نقش + frozenset نام دسترسی‌ها"""
+    __slots__ = ()
+
+    def allows(self, permission_name):
+        # ادمین به همه چیز دسترسی داره
+        return self.role_name == 'admin' or permission_name in self.names
+
+
+def compile_role_permissions(role_id):
+    """خواندن نام نقش و همه دسترسی‌هاش در یک کوئری"""
+    rows = (db.session.query(Role.name, Permission.name)
+            .outerjoin(Permission, Permission.role_id == Role.id)
+            .filter(Role.id == role_id)
+            .all())
+    if not rows:
+        return RolePermissions(None, frozenset())
+    return RolePermissions(rows[0][0], frozenset(name for _, name in rows if name))
+
+
+def get_role_permissions(role_id):
+    """
+    دسترسی‌های نقش؛ اول از حافظه درخواست جاری (g)، بعد از کش پردازه
+    و در نهایت از دیتابیس
+    """
+    memo = g.setdefault('_role_permissions', {}) if has_app_context() else {}
+    compiled = memo.get(role_id)
+    if compiled is None:
+        compiled = _role_permissions.get(role_id)
+        if compiled is None:
+            compiled = compile_role_permissions(role_id)
+            _role_permissions.set(role_id, compiled)
+        memo[role_id] = compiled
+    return compiled
+
+
+def prime_role_permissions(role_id, role_name, names):
+    """ثبت دسترسی‌هایی که همراه کوئری دیگه‌ای (مثلاً لود کاربر) خونده شدن"""
+    compiled = RolePermissions(role_name, frozenset(names))
+    _role_permissions.set(role_id, compiled)
+    if has_app_context():
+        g.setdefault('_role_permissions', {})[role_id] = compiled
+    return compiled
+
+
+def invalidate_role_permissions(changed=None):
+    _role_permissions.clear()
+    if has_app_context():
+        g.pop('_role_permissions', None)
+
+
+# هر تغییر در نقش‌ها یا دسترسی‌ها کش رو باطل می‌کنه (در همه workerها)
+on_commit_change((Role, Permission), invalidate_role_permissions, shared=True)
+on_commit_change((FormAccess, UserPermission), shared=True)
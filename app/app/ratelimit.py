@@ -0,0 +1,205 @@
+# app/ratelimit.py
+"""
+محدودیت تعداد تلاش ورود (پنجره لغزان) برای محافظت از CPU.
+
+هر تلاش ورود یک هش سنگین رمز (app/passwords.py) هزینه داره؛ یک اسکریپت
+brute-force یا کلاینت خراب می‌تونه همه هسته‌ها رو پر کنه. اینجا قبل از
+هر هش یا کوئری روی User، تلاش برای دو کلید ثبت می‌شه:
+
+    user:<نام کاربری>   حداکثر LOGIN_LIMIT_PER_USER تلاش در LOGIN_LIMIT_WINDOW ثانیه
+    ip:<آدرس کلاینت>    حداکثر LOGIN_LIMIT_PER_IP تلاش (باید بزرگ باشه؛ یک اداره پشت NAT
+                        اول شیفت همه با یک IP وارد می‌شن)
+
+اگر یکی پر باشه درخواست با 429 و Retry-After رد می‌شه. ورود موفق تلاش
+خودش رو پس می‌ده، پس فقط تلاش‌های ناموفق (و در حال اجرا) حساب می‌شن.
+
+    LOGIN_LIMIT_BACKEND  'memory' (هر پردازه جدا) یا 'database' (مشترک بین
+                         workerها، جدول login_attempt؛ یک نوشتن به ازای هر تلاش)
+
+تعداد ردها در /metrics (putapp_login_rejections_total) دیده می‌شه.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from sqlalchemy import delete, func, insert, select
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStore:
+    """زمان تلاش‌های هر کلید در همین پردازه؛ حداکثر max_keys کلید (قدیمی‌ترها دور ریخته می‌شن)"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._hits = OrderedDict()  # کلید -> deque زمان‌ها
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window, now):
+        """ثبت تلاش اگر جا باشه؛ خروجی (پذیرفته شد؟, ثانیه تا خالی شدن جا)"""
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+                while len(self._hits) > self.max_keys:
+                    self._hits.popitem(last=False)
+            self._hits.move_to_end(key)
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) >= limit:
+                return False, hits[0] + window - now
+            hits.append(now)
+            return True, 0
+
+    def release(self, key, stamp):
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits and stamp in hits:
+                hits.remove(stamp)
+
+    def clear(self):
+        with self._lock:
+            self._hits.clear()
+
+
+class DatabaseStore:
+    """تلاش‌ها در جدول login_attempt، مشترک بین همه workerها"""
+
+    def __init__(self, engine, prune_interval=60):
+        from app.models import LoginAttempt
+        self.engine = engine
+        self.table = LoginAttempt.__table__
+        self.prune_interval = prune_interval
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window, now):
+        table = self.table
+        with self.engine.begin() as conn:
+            self._prune(conn, window, now)
+            # شمارش و ثبت جدا از session درخواست و بلافاصله commit می‌شه تا بقیه
+            # workerها ببینن؛ بین این دو ممکنه چند تلاش هم‌زمان رد نشن (تقریبی)
+            count, oldest = conn.execute(
+                select(func.count(), func.min(table.c.attempted_at))
+                .where(table.c.key == key, table.c.attempted_at > now - window)).one()
+            if count >= limit:
+                return False, oldest + window - now
+            conn.execute(insert(table).values(key=key, attempted_at=now))
+        return True, 0
+
+    def release(self, key, stamp):
+        table = self.table
+        with self.engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.key == key, table.c.attempted_at == stamp))
+
+    def _prune(self, conn, window, now):
+        with self._lock:
+            if now - self._pruned_at < self.prune_interval:
+                return
+            self._pruned_at = now
+        conn.execute(delete(self.table).where(self.table.c.attempted_at <= now - window))
+
+    def clear(self):
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table))
+
+
+class Rejected(Exception):
+    """تلاش ورود بیش از حد مجاز؛ retry_after به ثانیه"""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(scope)
+        self.scope = scope
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+class LoginLimiter:
+    def __init__(self, store, per_user=10, per_ip=100, window=300):
+        self.store = store
+        self.limits = {'user': per_user, 'ip': per_ip}
+        self.window = window
+        self.rejections = {'user': 0, 'ip': 0}
+        self._lock = threading.Lock()
+
+    def acquire(self, username, address):
+        """
+        ثبت یک تلاش برای نام کاربری و آدرس؛ اگر یکی پر باشه Rejected.
+        خروجی رسیدی است که بعد از ورود موفق به release داده می‌شه.
+        """
+        now = time.time()
+        taken = []
+        keys = (('ip', f'ip:{address}'), ('user', f'user:{(username or "").strip().lower()}'))
+        for scope, key in keys:
+            limit = self.limits[scope]
+            if not limit:
+                continue
+            accepted, retry_after = self.store.hit(key, limit, self.window, now)
+            if not accepted:
+                # تلاشی که برای کلید قبلی ثبت شد هم پس داده می‌شه
+                for taken_key in taken:
+                    self.store.release(taken_key, now)
+                with self._lock:
+                    self.rejections[scope] += 1
+                logger.info('تلاش ورود رد شد (%s)', key)
+                raise Rejected(scope, retry_after)
+            taken.append(key)
+        return taken, now
+
+    def release(self, receipt):
+        """پس دادن تلاش یک ورود موفق"""
+        keys, stamp = receipt
+        for key in keys:
+            self.store.release(key, stamp)
+
+
+_limiter = None
+
+
+def get_limiter():
+    return _limiter
+
+
+def client_address(request, proxy_hops=0):
+    """آدرس کلاینت؛ پشت proxy، proxy_hops آدرس آخر X-Forwarded-For که proxyهای خودمون اضافه کردن"""
+    if proxy_hops:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= proxy_hops:
+            return forwarded[-proxy_hops]
+    return request.remote_addr or 'unknown'
+
+
+def _collect_metrics(prefix):
+    if _limiter is None:
+        return []
+    with _limiter._lock:
+        rejections = dict(_limiter.rejections)
+    lines = [
+        f'# HELP {prefix}_login_rejections_total Login attempts rejected by the rate limiter.',
+        f'# TYPE {prefix}_login_rejections_total counter',
+    ]
+    for scope, count in sorted(rejections.items()):
+        lines.append(f'{prefix}_login_rejections_total{{scope="{scope}"}} {count}')
+    return lines
+
+
+def init_app(app):
+    global _limiter
+    config = app.config
+    if not config.get('LOGIN_LIMIT_ENABLED', True):
+        _limiter = None
+        return
+    if config.get('LOGIN_LIMIT_BACKEND', 'memory') == 'database':
+        from app import db
+        with app.app_context():
+            store = DatabaseStore(db.engine)
+    else:
+        store = MemoryStore(config.get('LOGIN_LIMIT_MAX_KEYS', 100000))
+    _limiter = LoginLimiter(
+        store,
+        per_user=config.get('LOGIN_LIMIT_PER_USER', 10),
+        per_ip=config.get('LOGIN_LIMIT_PER_IP', 100),
+        window=config.get('LOGIN_LIMIT_WINDOW', 300),
+    )
+
+    from app import metrics
+    metrics.register_collector(_collect_metrics)
@@ -0,0 +1,95 @@
+# app/rendering.py
+"""
+کش HTML آماده جدول صفحه پر کردن فرم.
+
+بدنه جدول (form/_fill_table.html) فقط به ساختار فرم بستگی داره و برای
+فرم‌های جدولی بزرگ (مثلاً ۳۰۰ سطر × ۱۵ ستون) رندرش پرهزینه است. HTML
+رندر شده با کلید (id فرم, hash ساختار, hash قالب) در یک کش LRU نگه داشته
+می‌شه و اگر FILL_CACHE_FOLDER تنظیم شده باشه روی دیسک هم نوشته می‌شه تا
+workerهای دیگه و ری‌استارت‌ها هم ازش استفاده کنن. بخش‌های وابسته به
+درخواست (CSRF token، نام کاربر، ...) همچنان در fill.html رندر می‌شن.
+"""
+import hashlib
+import logging
+import os
+from flask import current_app, render_template
+from markupsafe import Markup
+from app.cache import LocalCache
+from app.structures import EMPTY_STRUCTURE, get_form_structure
+
+FILL_TABLE_TEMPLATE = 'form/_fill_table.html'
+
+logger = logging.getLogger(__name__)
+
+_fill_tables = LocalCache('fill_tables', maxsize=64)
+_template_hash = None
+
+
+def _template_version():
+    """hash متن قالب؛ با عوض شدن قالب، کش دیسک قدیمی استفاده نمی‌شه"""
+    global _template_hash
+    if _template_hash is None:
+        source, _, _ = current_app.jinja_env.loader.get_source(current_app.jinja_env, FILL_TABLE_TEMPLATE)
+        _template_hash = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+    return _template_hash
+
+
+def _disk_path(folder, form_id, structure_hash):
+    return os.path.join(folder, f'fill_{form_id}_{structure_hash[:16]}_{_template_version()}.html')
+
+
+def _read_disk(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_disk(folder, form_id, path, html):
+    # فایل موقت و بعد replace؛ خواننده هیچ وقت فایل نیمه‌کاره نمی‌بینه
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp, path)
+        # نسخه‌های قدیمی همین فرم دیگه استفاده نمی‌شن
+        prefix = f'fill_{form_id}_'
+        for name in os.listdir(folder):
+            if name.startswith(prefix) and name.endswith('.html') and os.path.join(folder, name) != path:
+                os.remove(os.path.join(folder, name))
+    except OSError as e:
+        logger.warning('ذخیره کش جدول فرم روی دیسک ناموفق: %s', e)
+
+
+def render_fill_table(form):
+    """HTML جدول صفحه fill برای فرم (Markup)، از کش در صورت وجود"""
+    try:
+        structure = get_form_structure(form)
+    except ValueError:
+        return Markup(render_template(FILL_TABLE_TEMPLATE, structure=EMPTY_STRUCTURE))
+
+    key = (form.id, structure.hash, _template_version())
+    html = _fill_tables.get(key)
+    if html is not None:
+        return html
+
+    folder = current_app.config.get('FILL_CACHE_FOLDER')
+    path = _disk_path(folder, form.id, structure.hash) if folder else None
+    text = _read_disk(path) if path else None
+    if text is None:
+        text = render_template(FILL_TABLE_TEMPLATE, structure=structure.data)
+        if path:
+            _write_disk(folder, form.id, path, text)
+
+    html = Markup(text)
+    _fill_tables.set(key, html)
+    return html
+
+
+def init_app(app):
+    global _template_hash
+    _template_hash = None
+    _fill_tables.maxsize = app.config.get('FILL_CACHE_SIZE', 64)
+    if app.config.get('FILL_CACHE_FOLDER'):
+        os.makedirs(app.config['FILL_CACHE_FOLDER'], exist_ok=True)
@@ -0,0 +1,104 @@
+# app/replica.py
+"""
+خواندن صفحه‌های گزارش از دیتابیس replica.
+
+اگر REPLICA_DATABASE_URL تنظیم شده باشه یک bind به اسم 'replica' ساخته
+می‌شه. ویوهایی که با @read_replica علامت خوردن SELECTهاشون رو از replica
+می‌خونن. این موارد همیشه روی دیتابیس اصلی می‌مونن:
+    - هر نوشتن (flush، insert/update/delete) و همه کوئری‌های بعد از اون در همون درخواست
+    - چند ثانیه بعد از هر نوشتن همون کاربر (REPLICA_STICKY_SECONDS؛ مثلاً
+      لیست فرم‌ها بلافاصله بعد از fill)
+    - کارهای قبل از ویو (لاگین، دسترسی‌ها، شمارنده کش)؛ دکوراتور باید
+      نزدیک‌ترین دکوراتور به تابع ویو باشه
+
+replica می‌تونه دیتابیس سرور دوم باشه یا یک کپی SQLite که با
+scripts/refresh_replica.py به‌روز می‌شه (فقط خواندنی و با NullPool، تا هر
+اتصال جدید آخرین کپی رو ببینه).
+"""
+import time
+from functools import wraps
+from flask import g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import Select
+
+REPLICA_BIND = 'replica'
+STICKY_KEY = '_primary_until'
+
+
+class RoutingSession(Session):
+    """Session که SELECTهای ویوهای فقط‌خواندنی رو به replica می‌فرسته"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or (clause is not None and not isinstance(clause, Select)):
+                # از این به بعد این درخواست (و چند ثانیه بعدش) از اصلی می‌خونه
+                g._wrote_primary = True
+            elif g.get('_read_replica') and not g.get('_wrote_primary') and not (self.new or self.dirty or self.deleted):
+                engine = self._db.engines.get(REPLICA_BIND)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """ویو فقط‌خواندنی؛ SELECTهاش در صورت امکان از replica"""
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        if session.get(STICKY_KEY, 0) < time.time():
+            g._read_replica = True
+        return view(*args, **kwargs)
+    return decorated_function
+
+
+def replica_url(url):
+    """کپی SQLite فقط خواندنی باز می‌شه؛ آدرس سرورها بدون تغییر"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != 'sqlite' or parsed.database in (None, '', ':memory:'):
+        return url
+    # فایل replica در جا عوض نمی‌شه (با os.replace جایگزین می‌شه)، پس immutable امن است
+    return f'sqlite:///file:{parsed.database}?mode=ro&immutable=1&uri=true'
+
+
+def replica_path(config):
+    """مسیر فایل replica اگر SQLite باشه"""
+    url = config.get('REPLICA_DATABASE_URL')
+    if not url:
+        return None
+    parsed = make_url(url)
+    return parsed.database if parsed.get_backend_name() == 'sqlite' else None
+
+
+def configure(app):
+    """اضافه کردن bind مربوط به replica؛ قبل از db.init_app"""
+    url = app.config.get('REPLICA_DATABASE_URL')
+    if not url:
+        return
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    options = {'url': replica_url(url)}
+    if make_url(url).get_backend_name() == 'sqlite':
+        options['poolclass'] = NullPool
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_size'] = app.config.get('DB_POOL_SIZE', 10)
+    binds[REPLICA_BIND] = options
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def _remember_write(response):
+    if g.get('_wrote_primary'):
+        session[STICKY_KEY] = time.time() + g.get('_sticky_seconds', 10)
+    return response
+
+
+def init_app(app):
+    if not app.config.get('REPLICA_DATABASE_URL'):
+        return
+    sticky = app.config.get('REPLICA_STICKY_SECONDS', 10)
+
+    def set_sticky():
+        g._sticky_seconds = sticky
+
+    app.before_request(set_sticky)
+    app.after_request(_remember_write)
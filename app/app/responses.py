@@ -0,0 +1,170 @@
+# app/responses.py
+"""
+ذخیره پاسخ فرم‌ها.
+
+علاوه بر JSON کامل در FormResponse.responses، هر خانه می‌تونه به صورت
+تایپ‌دار در جدول response_cell هم نوشته بشه (تنظیم RESPONSE_STORAGE):
+    'blob'  - فقط JSON (پیش‌فرض)
+    'both'  - JSON + response_cell
+    'cells' - فقط response_cell
+"""
+import json
+import re
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models import FormResponse, ResponseCell
+
+CELL_KEY = re.compile(r'^cell_(\d+)_(\d+)$')
+
+
+def parse_cell_key(key):
+    """'cell_3_1' -> (3, 1)؛ کلید نامعتبر -> None"""
+    match = CELL_KEY.match(key)
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def _column_type(structure, col):
+    columns = structure.get('columns', []) if isinstance(structure, dict) else []
+    if col < len(columns):
+        return columns[col].get('type', 'text')
+    return 'text'
+
+
+def typed_value(col_type, value):
+    """مقدار متنی فرم -> (num_value, date_value, text_value)"""
+    num_value = date_value = None
+    if col_type == 'number':
+        try:
+            num_value = float(value)
+        except ValueError:
+            pass
+    elif col_type == 'checkbox':
+        num_value = 1.0 if value == 'true' else 0.0
+    elif col_type == 'date':
+        try:
+            date_value = date.fromisoformat(value)
+        except ValueError:
+            pass
+    return num_value, date_value, value
+
+
+def build_cells(form_id, structure, data):
+    """ساخت ResponseCell برای خانه‌های غیرخالی"""
+    cells = []
+    for key, value in data.items():
+        position = parse_cell_key(key)
+        if position is None or value in (None, ''):
+            continue
+        row, col = position
+        num_value, date_value, text_value = typed_value(_column_type(structure, col), value)
+        cells.append(ResponseCell(
+            form_id=form_id, row=row, col=col,
+            num_value=num_value, date_value=date_value, text_value=text_value
+        ))
+    return cells
+
+
+def create_form_response(form, user_id, data, filled_at=None, structure=None):
+    """
+    ساخت پاسخ جدید (بدون commit).
+    data همون dict کلیدهای cell_<row>_<col> است.
+    """
+    return create_form_responses(form, [(user_id, data, filled_at)], structure)[0]
+
+
+def create_form_responses(form, items, structure=None):
+    """
+    ساخت چند پاسخ با هم (بدون commit)؛ items لیستی از (user_id, data, filled_at).
+    آمار فرم برای کل دسته یک بار به‌روز می‌شه.
+    """
+    storage = current_app.config.get('RESPONSE_STORAGE', 'blob')
+    if structure is None:
+        structure = form.get_structure()
+
+    form_responses = []
+    for user_id, data, filled_at in items:
+        form_response = FormResponse(
+            form_id=form.id,
+            user_id=user_id,
+            responses=json.dumps(data, ensure_ascii=False) if storage != 'cells' else None,
+            filled_at=filled_at or datetime.utcnow()
+        )
+        if storage in ('both', 'cells'):
+            form_response.cells = build_cells(form.id, structure, data)
+        form_responses.append(form_response)
+    db.session.add_all(form_responses)
+
+    # آمار تجمعی فرم در همین تراکنش به‌روز می‌شه (app/form_stats.py)
+    from app import form_stats
+    if current_app.config.get('FORM_STATS_ENABLED', True):
+        form_stats.record_responses(form.id, structure, [data for _, data, _ in items])
+    else:
+        # این پاسخ‌ها در آمار نیستن؛ آمار فرم تا ساخت دوباره نامعتبره
+        form_stats.invalidate(form.id)
+    return form_responses
+
+
+def cells_to_data(response_id):
+    """بازسازی dict پاسخ از جدول response_cell"""
+    rows = (db.session.query(ResponseCell.row, ResponseCell.col, ResponseCell.text_value)
+            .filter(ResponseCell.response_id == response_id)
+            .all())
+    return {f'cell_{row}_{col}': value for row, col, value in rows}
+
+
+def column_summary(form_id, col, row=None):
+    """تعداد، جمع، میانگین، کمینه و بیشینه یک ستون عددی - تماماً در SQL"""
+    query = (db.session.query(
+                func.count(ResponseCell.num_value),
+                func.sum(ResponseCell.num_value),
+                func.avg(ResponseCell.num_value),
+                func.min(ResponseCell.num_value),
+                func.max(ResponseCell.num_value))
+             .filter(ResponseCell.form_id == form_id, ResponseCell.col == col))
+    if row is not None:
+        query = query.filter(ResponseCell.row == row)
+    count, total, average, minimum, maximum = query.one()
+    return {'count': count, 'sum': total, 'avg': average, 'min': minimum, 'max': maximum}
+
+
+def value_counts(form_id, col):
+    """توزیع مقادیر یک ستون (مثلاً گزینه‌های select/radio)"""
+    rows = (db.session.query(ResponseCell.text_value, func.count())
+            .filter(ResponseCell.form_id == form_id, ResponseCell.col == col)
+            .group_by(ResponseCell.text_value)
+            .all())
+    return dict(rows)
+
+
+_OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'ne': lambda column, value: column != value,
+    'lt': lambda column, value: column < value,
+    'le': lambda column, value: column <= value,
+    'gt': lambda column, value: column > value,
+    'ge': lambda column, value: column >= value,
+    'contains': lambda column, value: column.contains(value),
+}
+
+
+def filter_responses(form_id, col, op, value, col_type='text'):
+    """کوئری پاسخ‌هایی که خانه‌ای در ستون col با شرط داده شده دارن"""
+    if op not in _OPERATORS:
+        raise ValueError(f'عملگر نامعتبر: {op}')
+    num_value, date_value, text_value = typed_value(col_type, value)
+    if num_value is not None:
+        column, value = ResponseCell.num_value, num_value
+    elif date_value is not None:
+        column, value = ResponseCell.date_value, date_value
+    else:
+        column, value = ResponseCell.text_value, text_value
+
+    matching = (db.session.query(ResponseCell.response_id)
+                .filter(ResponseCell.form_id == form_id,
+                        ResponseCell.col == col,
+                        _OPERATORS[op](column, value)))
+    return FormResponse.query.filter(FormResponse.id.in_(matching))
@@ -1,9 +1,13 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+import logging
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
+from app import db, ratelimit
 from app.models import User
+from app.passwords import HashingBusy
 from app.forms.forms import LoginForm
 
 auth_bp = Blueprint('auth', __name__)
+logger = logging.getLogger(__name__)
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -11,8 +15,39 @@ def login():
         return redirect(url_for('main.dashboard'))
     form = LoginForm()
     if form.validate_on_submit():
+        # محدودیت تلاش قبل از هر کوئری و هش رمز (app/ratelimit.py)
+        receipt = None
+        limiter = ratelimit.get_limiter()
+        if limiter is not None:
+            address = ratelimit.client_address(request, current_app.config.get('LOGIN_LIMIT_PROXY_HOPS', 0))
+            try:
+                receipt = limiter.acquire(form.username.data, address)
+            except ratelimit.Rejected as e:
+                flash('تعداد تلاش‌های ورود زیاد است، لطفاً کمی بعد دوباره تلاش کنید', 'danger')
+                return render_template('auth/login.html', form=form), 429, {'Retry-After': str(e.retry_after)}
+
         user = User.query.filter_by(username=form.username.data).first()
-        if user and user.check_password(form.password.data):
+        try:
+            valid = bool(user and user.check_password(form.password.data))
+        except HashingBusy:
+            # تقصیر کاربر نیست؛ تلاشش حساب نمی‌شه
+            if receipt is not None:
+                limiter.release(receipt)
+            logger.warning('صف هش رمز پر است؛ ورود رد شد')
+            flash('سرور مشغول است، لطفاً چند لحظه دیگر دوباره تلاش کنید', 'warning')
+            return render_template('auth/login.html', form=form), 503
+        if valid:
+            if receipt is not None:
+                limiter.release(receipt)
+            # هش با روش/پارامترهای قدیمی با تنظیمات فعلی دوباره ساخته می‌شه؛
+            # اگر صف هش پر باشه دفعه بعد، ورود به خاطرش رد نمی‌شه
+            if user.password_needs_rehash():
+                try:
+                    user.rehash_password(form.password.data)
+                    db.session.commit()
+                    logger.info('هش رمز کاربر %s به‌روز شد', user.id)
+                except HashingBusy:
+                    logger.warning('صف هش رمز پر است؛ هش کاربر %s بعداً به‌روز می‌شه', user.id)
             login_user(user)
             return redirect(url_for('main.dashboard'))
         flash('نام کاربری یا رمز اشتباه است', 'danger')
@@ -1,11 +1,28 @@
 from datetime import datetime
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
-from app.models import Role, User, Form, UserPermission,FormResponse, FormAccess
+from sqlalchemy.orm import joinedload, load_only
+from app.models import Role, User, Form, FormResponse, FormAccess
 from app.decorators import can_create_form, can_edit_form, can_delete_form, can_manage_form, permission_required
+from app.pagination import keyset_paginate, cached_count
+from app.responses import create_form_response
+from app.form_stats import form_summary, start_form_stats
+from app.export import stream_csv, stream_jsonl
+from app.importer import READERS, import_responses, open_text
+from app.structures import load_structure, get_form_structure
+from app.rendering import render_fill_table
+from app.replica import read_replica
+from app import access
 import json
+import logging
 
 form_bp = Blueprint('form', __name__, url_prefix='/form')
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (stream_jsonl, 'application/x-ndjson; charset=utf-8'),
+}
 
 @form_bp.route('/create', methods=['GET', 'POST'])
 @login_required
@@ -27,8 +44,7 @@ def create():
                 flash('عنوان و ساختار فرم الزامی است', 'danger')
                 return redirect(url_for('form.create'))
             
-            print(f"📝 دریافت داده‌ها - عنوان: {title}")  # 🔥 برای دیباگ
-            print(f"📦 ساختار: {structure[:100]}...")    # 🔥 برای دیباگ
+            logger.debug('ایجاد فرم - عنوان: %s، ساختار: %.100s...', title, structure)
             
             # اصلاح: structure رو به صورت string ذخیره کن
             form = Form(
@@ -37,13 +53,15 @@ def create():
                 created_by=current_user.id
             )
             db.session.add(form)
+            db.session.flush()
+            start_form_stats(form.id)
             db.session.commit()
             
             flash('فرم با موفقیت ایجاد شد!', 'success')
             return redirect(url_for('form.list'))
             
         except Exception as e:
-            print(f"❌ خطا در ایجاد فرم: {e}")
+            logger.exception('خطا در ایجاد فرم')
             flash('خطا در ایجاد فرم', 'danger')
             return redirect(url_for('form.create'))
     
@@ -51,8 +69,13 @@ def create():
 
 @form_bp.route('/list')
 @login_required
+@read_replica
 def list():
-    forms = Form.query.all()
+    # فقط فرم‌هایی که کاربر می‌تونه ببینه یا پر کنه (app/access.py)؛
+    # فقط ستون‌هایی که لیست نشون می‌ده؛ structure (JSON بزرگ) لود نمی‌شه
+    forms = (access.accessible_forms(current_user, access.VIEW | access.FILL)
+             .options(load_only(Form.id, Form.title, Form.created_at, Form.created_by))
+             .all())
     return render_template('form/list.html', forms=forms)
 
 @form_bp.route('/fill/<int:form_id>', methods=['GET', 'POST'])
@@ -60,55 +83,43 @@ def list():
 def fill(form_id):
     from app import db
     form = Form.query.get_or_404(form_id)
+    if not can_user_fill_form(current_user, form):
+        flash('شما اجازه پر کردن این فرم را ندارید', 'danger')
+        return redirect(url_for('form.list'))
     
     if request.method == 'POST':
         try:
-            print("🔍 دریافت داده‌های فرم...")
-            
             # استخراج پاسخ‌ها
             responses = {}
             for key, value in request.form.items():
                 if key.startswith('cell_'):
                     responses[key] = value
             
-            print(f"📦 پاسخ‌های استخراج شده: {responses}")
-            
-            # ذخیره در دیتابیس
-            form_response = FormResponse(
-                form_id=form_id,
-                user_id=current_user.id,
-                responses=json.dumps(responses, ensure_ascii=False),
-                filled_at=datetime.utcnow()
-            )
+            # پرتعداد در روزهای آخر مهلت؛ فقط نمونه‌ای از پاسخ‌ها لاگ می‌شه
+            logger.debug('پاسخ‌های استخراج شده برای فرم %s: %s', form.id, responses,
+                         extra={'sample_rate': 0.01})
             
-            db.session.add(form_response)
+            # ذخیره در دیتابیس (JSON و/یا خانه‌های تایپ‌دار - app/responses.py)
+            create_form_response(form, current_user.id, responses)
             db.session.commit()
             
-            print("✅✅✅ ذخیره موفق! ✅✅✅")
+            logger.info('پاسخ فرم %s ثبت شد', form.id,
+                        extra={'form_id': form.id, 'user_id': current_user.id, 'cells': len(responses)})
             flash('فرم با موفقیت پر و ذخیره شد!', 'success')
             return redirect(url_for('form.list'))
             
         except Exception as e:
-            print(f"❌ خطا: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception('خطا در ذخیره پاسخ فرم %s', form.id)
             db.session.rollback()
             flash('خطا در ذخیره فرم', 'danger')
     
-    structure = json.loads(form.structure)
-    return render_template('form/fill.html', form=form, structure=structure)
+    # بدنه جدول مستقل از کاربر است و برای هر نسخه ساختار فقط یک بار رندر می‌شه
+    return render_template('form/fill.html', form=form, table_html=render_fill_table(form))
 
 # تابع کمکی برای چک دسترسی
 def can_user_fill_form(user, form):
-    return (
-        form.created_by == user.id or
-        user.role == 'admin' or
-        UserPermission.query.filter_by(
-            user_id=user.id, 
-            form_id=form.id, 
-            can_fill=True
-        ).first() is not None
-    )
+    # مالکیت + grant نقش + grant کاربر در یک کوئری (app/access.py)
+    return access.can(user, form.id, access.FILL)
 
 # تابع کمکی برای استخراج پاسخ‌ها
 def extract_form_responses(form_data):
@@ -123,27 +134,24 @@ def extract_form_responses(form_data):
 @permission_required('form.manage_all')
 def permissions(form_id):
     from app import db
-    if current_user.role != 'admin':
+    if not current_user.is_admin():
         flash('فقط ادمین', 'danger')
         return redirect(url_for('main.dashboard'))
     
     form = Form.query.get_or_404(form_id)
     if request.method == 'POST':
-        for user_id in request.form:
-            perm = UserPermission.query.filter_by(user_id=user_id, form_id=form_id).first()
-            if not perm:
-                perm = UserPermission(user_id=user_id, form_id=form_id)
-                db.session.add(perm)
-            perm.can_view = 'view_' + user_id in request.form
-            perm.can_fill = 'fill_' + user_id in request.form
-            perm.can_edit = 'edit_' + user_id in request.form
-            perm.can_delete = 'delete_' + user_id in request.form
+        # فیلدهای view_<user_id>، fill_<user_id>، ... ؛ حالا به جای UserPermission
+        # به grant نوع 'user' در FormAccess تبدیل می‌شن
+        user_ids = {key.partition('_')[2] for key in request.form if '_' in key}
+        for user_id in filter(str.isdigit, user_ids):
+            bits = access.parse_permissions(
+                [name for name in ('view', 'fill', 'edit', 'delete') if f'{name}_{user_id}' in request.form])
+            access.set_grant(form_id, 'user', int(user_id), bits)
         db.session.commit()
         flash('دسترسی‌ها ذخیره شد', 'success')
     
-    users = User.query.all()
-    permissions = {p.user_id: p for p in UserPermission.query.filter_by(form_id=form_id)}
-    return render_template('form/permissions.html', form=form, users=users, permissions=permissions)
+    # صفحه مشترک مدیریت دسترسی‌ها
+    return redirect(url_for('form.manage_access', form_id=form_id))
 
 
 @form_bp.route('/create_advanced', methods=['GET', 'POST'])
@@ -157,6 +165,8 @@ def create_advanced():
         
         form = Form(title=title, structure=structure, created_by=current_user.id)
         db.session.add(form)
+        db.session.flush()
+        start_form_stats(form.id)
         db.session.commit()
         
         flash('فرم با موفقیت ایجاد شد!', 'success')
@@ -177,6 +187,8 @@ def create_matrix():
         
         form = Form(title=title, structure=structure, created_by=current_user.id)
         db.session.add(form)
+        db.session.flush()
+        start_form_stats(form.id)
         db.session.commit()
         
         flash('فرم جدولی با موفقیت ایجاد شد!', 'success')
@@ -195,7 +207,7 @@ def fill_matrix(form_id):
     if request.method == 'POST':
         # پردازش داده‌های ارسالی
         data = request.form.to_dict()
-        print("داده‌های دریافت شده:", data)
+        logger.debug('داده‌های دریافت شده fill_matrix: %s', data)
         flash('داده‌ها با موفقیت ذخیره شد!', 'success')
         return redirect(url_for('form.list'))
     
@@ -209,106 +221,202 @@ def fill_matrix(form_id):
 @form_bp.route('/view/<int:form_id>')
 @login_required
 @can_edit_form
+@read_replica
 def view(form_id):
     form = Form.query.get_or_404(form_id)
     
-    # اگر structure رشته JSON هست، به object تبدیل کن
-    if isinstance(form.structure, str):
-        try:
-            structure_data = json.loads(form.structure)
-        except:
-            structure_data = {'rows': 0, 'columns': [], 'default_data': []}
-    else:
-        structure_data = form.structure
+    # ساختار parse شده از کش (JSON خراب -> ساختار خالی)
+    structure_data = load_structure(form)
     
     return render_template('form/view.html', form=form, structure=structure_data)
 
 
 @form_bp.route('/all_responses')
 @login_required
+@read_replica
 def all_responses():
-    # دریافت صفحه از پارامتر URL
-    page = request.args.get('page', 1, type=int)
+    from app import db
     per_page = 15  # تعداد در هر صفحه
-    
-    # محاسبه offset
-    offset = (page - 1) * per_page
-    
+
+    # صفحه‌بندی با cursor روی (filled_at, id) به جای offset
+    after = request.args.get('after')
+    before = request.args.get('before')
+
     # تمام پاسخ‌های کاربر (یا اگر ادمین هست، همه پاسخ‌ها)
     if current_user.role == 'admin':
-        query = FormResponse.query.order_by(FormResponse.filled_at.desc())
-        total_responses = query.count()
-        responses = query.offset(offset).limit(per_page).all()
+        query = FormResponse.query
+        count_key = 'all_responses'
     else:
         # فقط پاسخ‌های فرم‌هایی که کاربر ساخته
-        user_forms = Form.query.filter_by(created_by=current_user.id).all()
-        form_ids = [form.id for form in user_forms]
-        query = FormResponse.query.filter(FormResponse.form_id.in_(form_ids)).order_by(FormResponse.filled_at.desc())
-        total_responses = query.count()
-        responses = query.offset(offset).limit(per_page).all()
-    
-    # محاسبه تعداد صفحات
-    total_pages = (total_responses + per_page - 1) // per_page
-    
+        user_forms = db.session.query(Form.id).filter_by(created_by=current_user.id)
+        query = FormResponse.query.filter(FormResponse.form_id.in_(user_forms))
+        count_key = ('all_responses', current_user.id)
+
+    # فرم، سازنده فرم و کاربر هر پاسخ در همون کوئری صفحه (بدون N+1)؛
+    # JSON پاسخ‌ها و ساختار فرم‌ها لازم نیست
+    page_query = query.options(
+        load_only(FormResponse.id, FormResponse.form_id, FormResponse.user_id, FormResponse.filled_at),
+        joinedload(FormResponse.form).load_only(Form.id, Form.title, Form.created_by)
+            .joinedload(Form.creator).load_only(User.id, User.username),
+        joinedload(FormResponse.user).load_only(User.id, User.username),
+    )
+    page = keyset_paginate(page_query, (FormResponse.filled_at, FormResponse.id),
+                           after=after, before=before, per_page=per_page)
+
+    # تعداد کل از کش کوتاه‌مدت؛ صفحه‌های عمیق دیگه count کامل نمی‌گیرن
+    total_responses = cached_count(count_key, query, current_app.config['RESPONSES_COUNT_TTL'])
+
     return render_template('form/all_responses.html', 
-                         responses=responses,
+                         responses=page.items,
                          page=page,
                          per_page=per_page,
-                         total_responses=total_responses,
-                         total_pages=total_pages)
+                         total_responses=total_responses)
 
 
 
 @form_bp.route('/responses/<int:form_id>')
 @login_required
 @can_edit_form
+@read_replica
 def view_responses(form_id):
     form = Form.query.get_or_404(form_id)
     
-    # اگر response_id مشخص شده، فقط اون پاسخ رو نشون بده
-    response_id = request.args.get('response_id')
+    # اگر response_id مشخص شده، فقط اون پاسخ رو کامل نشون بده
+    response_id = request.args.get('response_id', type=int)
     if response_id:
-        response = FormResponse.query.get_or_404(response_id)
-        responses = [response]
-    else:
-        # همه پاسخ‌های این فرم
-        responses = FormResponse.query.filter_by(form_id=form_id).all()
-    
-    # پردازش پاسخ‌ها (همون کد قبلی)
-    processed_responses = []
-    for response in responses:
-        try:
-            if isinstance(response.responses, str):
-                response_data = json.loads(response.responses)
-            else:
-                response_data = response.responses
-            processed_responses.append({
-                'id': response.id,
-                'user': response.user,
-                'filled_at': response.filled_at,
-                'data': response_data
-            })
-        except:
-            processed_responses.append({
-                'id': response.id,
-                'user': response.user,
-                'filled_at': response.filled_at,
-                'data': {}
-            })
-    
-    # تبدیل structure فرم
-    if isinstance(form.structure, str):
+        response = FormResponse.query.filter_by(id=response_id, form_id=form_id).first_or_404()
         try:
-            structure = json.loads(form.structure)
-        except:
-            structure = {'rows': 0, 'columns': [], 'default_data': []}
+            response_data = response.get_data()
+        except ValueError:
+            response_data = {}
+        responses = [{
+            'id': response.id,
+            'user': response.user,
+            'filled_at': response.filled_at,
+            'data': response_data
+        }]
+        page = None
+        total_responses = 1
     else:
-        structure = form.structure
+        # صفحه‌بندی cursor؛ کاربرها با join در همون کوئری و بدون JSON پاسخ‌ها.
+        # جدول هر پاسخ با کلیک از /form/responses/<form_id>/<response_id>/cells لود می‌شه
+        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        query = (FormResponse.query
+                 .filter_by(form_id=form_id)
+                 .options(joinedload(FormResponse.user).load_only(User.username),
+                          load_only(FormResponse.id, FormResponse.user_id, FormResponse.filled_at)))
+        page = keyset_paginate(query, (FormResponse.filled_at, FormResponse.id),
+                               after=request.args.get('after'),
+                               before=request.args.get('before'),
+                               per_page=per_page)
+        responses = [{
+            'id': response.id,
+            'user': response.user,
+            'filled_at': response.filled_at,
+            'data': None
+        } for response in page.items]
+        total_responses = cached_count(('form_responses', form_id),
+                                       FormResponse.query.filter_by(form_id=form_id),
+                                       current_app.config['RESPONSES_COUNT_TTL'])
+    
+    # ساختار فرم از کش
+    structure = load_structure(form)
     
     return render_template('form/responses.html', 
                          form=form, 
-                         responses=processed_responses, 
-                         structure=structure)
+                         responses=responses, 
+                         structure=structure,
+                         page=page,
+                         total_responses=total_responses)
+
+
+@form_bp.route('/responses/<int:form_id>/<int:response_id>/cells')
+@login_required
+@can_edit_form
+@read_replica
+def response_cells(form_id, response_id):
+    """خانه‌های یک پاسخ به صورت JSON فشرده: cells[row][col]"""
+    response = FormResponse.query.filter_by(id=response_id, form_id=form_id).first_or_404()
+    form = Form.query.get_or_404(form_id)
+    try:
+        structure = get_form_structure(form)
+    except ValueError:
+        return jsonify({'error': 'ساختار فرم نامعتبر است'}), 500
+    try:
+        data = response.get_data()
+    except ValueError:
+        data = {}
+    return jsonify({
+        'id': response.id,
+        'rows': structure.rows,
+        'cols': len(structure.columns),
+        'cells': [[data.get(key) or '' for key in keys] for keys in structure.cell_keys],
+    })
+
+
+@form_bp.route('/summary/<int:form_id>')
+@login_required
+@can_edit_form
+def summary(form_id):
+    form = Form.query.get_or_404(form_id)
+    structure = form.get_structure()
+    return render_template('form/summary.html',
+                         form=form,
+                         structure=structure,
+                         summary=form_summary(form.id, structure))
+
+
+@form_bp.route('/summary/<int:form_id>/json')
+@login_required
+@can_edit_form
+def summary_json(form_id):
+    form = Form.query.get_or_404(form_id)
+    structure = form.get_structure()
+    include_cells = request.args.get('cells') == '1'
+    return jsonify(form_summary(form.id, structure, include_cells))
+
+
+@form_bp.route('/export/<int:form_id>/<fmt>')
+@login_required
+@can_edit_form
+def export_responses(form_id, fmt):
+    form = Form.query.get_or_404(form_id)
+    if fmt not in EXPORT_FORMATS:
+        flash('فرمت خروجی نامعتبر است', 'danger')
+        return redirect(url_for('form.view_responses', form_id=form_id))
+
+    stream, mimetype = EXPORT_FORMATS[fmt]
+    # خروجی تکه تکه ارسال می‌شه؛ کل پاسخ‌ها هیچ وقت با هم در حافظه نیستن
+    return Response(
+        stream_with_context(stream(form.id, form.get_structure())),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=form_{form.id}_responses.{fmt}'}
+    )
+
+
+@form_bp.route('/import/<int:form_id>', methods=['GET', 'POST'])
+@login_required
+@permission_required('form.manage_all')
+def import_form_responses(form_id):
+    form = Form.query.get_or_404(form_id)
+    result = None
+
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        fmt = (upload.filename.rsplit('.', 1)[-1].lower() if upload and upload.filename else '')
+        if fmt not in READERS:
+            flash('فایل CSV یا JSONL انتخاب کنید', 'danger')
+            return redirect(url_for('form.import_form_responses', form_id=form_id))
+
+        records = READERS[fmt](open_text(upload), form.get_structure())
+        result = import_responses(form, records, current_user.id,
+                                  current_app.config.get('IMPORT_BATCH_SIZE', 500))
+        logger.info('ورود پاسخ‌های فرم %s: %d ثبت، %d خطا', form.id, result.imported, result.failed,
+                    extra={'form_id': form.id, 'imported': result.imported, 'failed': result.failed})
+        flash(f'{result.imported} پاسخ ثبت شد، {result.failed} ردیف خطا داشت',
+              'success' if not result.failed else 'warning')
+
+    return render_template('form/import.html', form=form, result=result, max_errors=200)
 
 
 # مدیریت دسترسی فرم
@@ -319,13 +427,56 @@ def manage_access(form_id):
     form = Form.query.get_or_404(form_id)
     roles = Role.query.all()
     users = User.query.all()
-    current_accesses = FormAccess.query.filter_by(form_id=form_id).all()
     
     return render_template('form/access_management.html', 
                          form=form,
                          roles=roles,
                          users=users,
-                         accesses=current_accesses)
+                         grants=access.grant_matrix(form_id))
+
+
+# ذخیره یکجای همه دسترسی‌های فرم (JSON)
+@form_bp.route('/access/<int:form_id>/bulk', methods=['POST'])
+@login_required
+def save_form_access_bulk(form_id):
+    """
+    بدنه: {"grants": [{"access_type": "role", "target_id": 3, "permissions": ["view", "fill"]}, ...],
+           "replace": true}
+    با replace (پیش‌فرض) لیست کامل است و grantهای دیگه حذف می‌شن؛
+    فقط تفاوت با وضعیت فعلی در یک تراکنش نوشته می‌شه.
+    """
+    from app import db
+    form = Form.query.get_or_404(form_id)
+    if not current_user.has_permission('form.manage_all') and form.created_by != current_user.id:
+        return jsonify({'error': 'دسترسی غیرمجاز'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'بدنه درخواست باید یک شیء JSON باشد'}), 400
+    try:
+        grants = access.parse_grant_matrix(payload.get('grants'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # همه نقش‌ها/کاربرهای داده شده باید وجود داشته باشن (دو کوئری، نه یکی برای هر ردیف)
+    role_ids = {target for kind, target in grants if kind == 'role'}
+    user_ids = {target for kind, target in grants if kind == 'user'}
+    known_roles = {role_id for (role_id,) in db.session.query(Role.id).filter(Role.id.in_(role_ids))} if role_ids else set()
+    known_users = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(user_ids))} if user_ids else set()
+    missing = sorted(role_ids - known_roles) + sorted(user_ids - known_users)
+    if missing:
+        return jsonify({'error': 'نقش/کاربر ناموجود', 'missing': missing}), 400
+    
+    try:
+        changes = access.apply_grants(form.id, grants, replace=payload.get('replace', True) is not False)
+        db.session.commit()
+    except Exception:
+        logger.exception('خطا در ذخیره دسترسی‌های فرم %s', form.id)
+        db.session.rollback()
+        return jsonify({'error': 'خطا در ذخیره دسترسی‌ها'}), 500
+    
+    logger.info('دسترسی‌های فرم %s ذخیره شد', form.id, extra={'form_id': form.id, **changes})
+    return jsonify({'success': True, **changes})
 
 # ذخیره دسترسی
 @form_bp.route('/access/save', methods=['POST'])
@@ -333,14 +484,13 @@ def manage_access(form_id):
 def save_form_access():
     from app import db
     try:
-        print("🔍 دریافت درخواست save_form_access")
-        
         form_id = request.form.get('form_id')
         access_type = request.form.get('access_type')
         target_id = request.form.get('target_id')
         permissions = request.form.getlist('permissions')
         
-        print(f"📥 داده‌ها: form_id={form_id}, access_type={access_type}, target_id={target_id}, permissions={permissions}")
+        logger.debug('save_form_access: form_id=%s, access_type=%s, target_id=%s, permissions=%s',
+                     form_id, access_type, target_id, permissions)
         
         # بررسی داده‌های ضروری
         if not all([form_id, access_type, target_id]):
@@ -352,24 +502,18 @@ def save_form_access():
         if not current_user.has_permission('form.manage_all') and form.created_by != current_user.id:
             return jsonify({'error': 'دسترسی غیرمجاز'}), 403
         
-        # حذف دسترسی‌های قبلی
-        FormAccess.query.filter_by(form_id=form_id, access_type=access_type, target_id=target_id).delete()
+        if access_type not in ('role', 'user'):
+            return jsonify({'error': 'نوع دسترسی نامعتبر'}), 400
         
-        # ایجاد دسترسی جدید
-        if permissions:
-            access = FormAccess(
-                form_id=form_id,
-                access_type=access_type,
-                target_id=target_id,
-                permissions=','.join(permissions)
-            )
-            db.session.add(access)
+        # جایگزین کردن دسترسی قبلی (بدون دسترسی = حذف)
+        access.set_grant(form.id, access_type, int(target_id), access.parse_permissions(permissions))
         
         db.session.commit()
-        print("✅ دسترسی ذخیره شد")
+        logger.info('دسترسی فرم %s ذخیره شد', form_id,
+                    extra={'form_id': form_id, 'access_type': access_type, 'target_id': target_id})
         return jsonify({'success': True})
         
     except Exception as e:
-        print(f"❌ خطا: {e}")
+        logger.exception('خطا در ذخیره دسترسی فرم')
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -1,5 +1,9 @@
-from flask import Blueprint, render_template
-from flask_login import login_required
+from flask import Blueprint, render_template, request, jsonify, current_app
+from flask_login import login_required, current_user
+from app import db, access
+from app.models import Form
+from app.replica import read_replica
+from app.search import search as search_index
 
 main_bp = Blueprint('main', __name__)
 
@@ -7,4 +11,25 @@ main_bp = Blueprint('main', __name__)
 @main_bp.route('/dashboard')
 @login_required
 def dashboard():
-    return render_template('dashboard.html')
\ No newline at end of file
+    return render_template('dashboard.html')
+
+
+@main_bp.route('/search')
+@login_required
+@read_replica
+def search():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config.get('SEARCH_PAGE_SIZE', 20)
+
+    # فقط فرم‌هایی که کاربر می‌بینه (app/access.py)؛ پاسخ‌ها فقط برای کسی که صفحه پاسخ‌ها رو داره
+    allowed = access.accessible_forms(current_user, access.VIEW | access.FILL)
+    form_ids = None if access.has_full_access(current_user) else allowed.with_entities(Form.id).statement
+    hits, has_next = search_index(db.session, query, form_ids=form_ids,
+                                  include_responses=current_user.can_edit_form(),
+                                  page=page, per_page=per_page) if query else ([], False)
+
+    if request.args.get('format') == 'json':
+        return jsonify({'query': query, 'page': page, 'has_next': has_next,
+                        'hits': [hit.to_dict() for hit in hits]})
+    return render_template('search.html', query=query, hits=hits, page=page, has_next=has_next)
@@ -0,0 +1,38 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, current_app
+from flask_login import login_required
+from app.models import Form
+from app.decorators import permission_required, can_view_reports
+from app.snapshots import Snapshot, build_snapshot
+
+reports_bp = Blueprint('reports', __name__, url_prefix='/reports')
+
+
+@reports_bp.route('/snapshot/<int:form_id>')
+@login_required
+@can_view_reports
+def snapshot(form_id):
+    form = Form.query.get_or_404(form_id)
+    snap = Snapshot.open(current_app.config['SNAPSHOT_FOLDER'], form_id)
+
+    # آمار ستون‌های عددی مستقیم از آرایه‌های memory-map شده
+    numbers = {}
+    if snap is not None:
+        with snap:
+            for col, column in enumerate(snap.meta['columns']):
+                if column['type'] == 'number':
+                    numbers[column['name'] or col + 1] = snap.number_summary(col)
+
+    return render_template('reports/snapshot.html',
+                         form=form,
+                         meta=snap.meta if snap else None,
+                         numbers=numbers)
+
+
+@reports_bp.route('/snapshot/<int:form_id>/generate', methods=['POST'])
+@login_required
+@permission_required('reports.generate')
+def generate_snapshot(form_id):
+    form = Form.query.get_or_404(form_id)
+    added = build_snapshot(form, current_app.config['SNAPSHOT_FOLDER'])
+    flash(f'اسنپ‌شات به‌روز شد ({added} پاسخ جدید)', 'success')
+    return redirect(url_for('reports.snapshot', form_id=form_id))
@@ -2,7 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from app.decorators import permission_required
-from app.decorators import can_manage_settings
+from app.decorators import can_manage_settings, admin_required
+from app import sql_profiler
 import os
 
 settings_bp = Blueprint('settings', __name__, url_prefix='/settings')
@@ -21,4 +22,24 @@ def logo():
             filename = secure_filename(file.filename)
             file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], 'logo.png'))
             flash('لوگو آپلود شد', 'success')
-    return render_template('settings/logo.html')
\ No newline at end of file
+    return render_template('settings/logo.html')
+
+
+@settings_bp.route('/sql', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def sql_profile():
+    """endpointهایی که بیشترین کوئری / زمان دیتابیس رو دارن (SQL_PROFILING=1)"""
+    if request.method == 'POST':
+        sql_profiler.reset_stats()
+        flash('آمار SQL پاک شد', 'success')
+        return redirect(url_for('settings.sql_profile'))
+
+    order_by = request.args.get('order', 'avg_queries')
+    if order_by not in ('avg_queries', 'max_queries', 'avg_db_ms', 'n_plus_one'):
+        order_by = 'avg_queries'
+    return render_template('settings/sql_profile.html',
+                         endpoints=sql_profiler.worst_endpoints(order_by=order_by),
+                         order_by=order_by,
+                         enabled=current_app.config.get('SQL_PROFILING'),
+                         threshold=current_app.config.get('SQL_NPLUSONE_THRESHOLD'))
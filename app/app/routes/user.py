@@ -1,12 +1,17 @@
+import logging
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload, load_only
 from app import db
 from app.models import User, Organization, Area, Position, Role  # 🔥 Role رو اضافه کن
+from app.passwords import HashingBusy
 from app.forms.forms import CreateUserForm, EditUserForm
 from flask_wtf import FlaskForm
 from app.decorators import can_create_user, can_edit_user, can_delete_user
+from app.replica import read_replica
 
 user_bp = Blueprint('user', __name__, url_prefix='/user')
+logger = logging.getLogger(__name__)
 
 @user_bp.route('/create', methods=['GET', 'POST'])
 @login_required
@@ -19,9 +24,7 @@ def create():
     form.position.choices = [(0, '--- انتخاب سمت ---')] + [(p.id, p.name) for p in Position.query.all()]
     # اضافه کردن انتخاب نقش
     roles = Role.query.all()
-    print(f"🔍 تعداد نقش‌ها: {len(roles)}")
-    for role in roles:
-        print(f"🔍 نقش: {role.id} - {role.name}")
+    logger.debug('نقش‌ها: %s', roles)
     form.role_id.choices = [(r.id, r.name) for r in roles]  # اگر فیلد role_id در فرم دارید
     if form.organization.data and form.organization.data != 0:
         form.area.choices = [(0, '--- انتخاب ناحیه ---')] + [
@@ -31,9 +34,9 @@ def create():
         form.area.choices = [(0, '--- ابتدا سازمان را انتخاب کنید ---')]
 
     if request.method == 'POST':
-        print("داده‌های فرم:", request.form)
+        # رمز عبور در فرم هست؛ فقط نام فیلدها لاگ می‌شه
+        logger.debug('فیلدهای فرم ایجاد کاربر: %s', list(request.form.keys()))
         if form.validate_on_submit():
-            print("فرم validate شد!")
             if User.query.filter_by(username=form.username.data).first():
                 flash('نام کاربری قبلاً استفاده شده', 'danger')
             else:
@@ -62,21 +65,32 @@ def create():
                     user_role = Role.query.filter_by(name='user').first()
                     user.role_id = user_role.id
                 
-                user.set_password(form.password.data)
+                try:
+                    user.set_password(form.password.data)
+                except HashingBusy:
+                    flash('سرور مشغول است، لطفاً چند لحظه دیگر دوباره تلاش کنید', 'warning')
+                    return render_template('user/create.html', form=form, roles=roles, active_menu='user'), 503
                 db.session.add(user)
                 db.session.commit()
                 
                 flash(f'کاربر {user.name} با نقش {user.role.name} ساخته شد!', 'success')
                 return redirect(url_for('user.list'))
         else:
-            print("خطاهای فرم:", form.errors)
+            logger.info('خطاهای فرم ایجاد کاربر: %s', form.errors)
 
     return render_template('user/create.html', form=form, roles=roles, active_menu='user')
 
 @user_bp.route('/list')
 @login_required
+@read_replica
 def list():
-    users = User.query.all()
+    # سازمان و ناحیه با join در همون کوئری؛ password_hash و بقیه ستون‌ها لود نمی‌شن
+    users = (User.query
+             .options(load_only(User.id, User.username, User.name, User.mobile, User.position,
+                                User.organization_id, User.area_id),
+                      joinedload(User.organization).load_only(Organization.id, Organization.name),
+                      joinedload(User.area).load_only(Area.id, Area.name))
+             .all())
     form = FlaskForm()  # فقط برای CSRF در فرم حذف
     return render_template('user/list.html', users=users, form=form, active_menu='user')
 
@@ -152,7 +166,12 @@ def edit(user_id):
 
         # اگر پسورد جدید وارد شده
         if form.password.data:
-            user.set_password(form.password.data)
+            try:
+                user.set_password(form.password.data)
+            except HashingBusy:
+                db.session.rollback()
+                flash('سرور مشغول است، لطفاً چند لحظه دیگر دوباره تلاش کنید', 'warning')
+                return render_template('user/edit.html', form=form, user=user, active_menu='user'), 503
 
         db.session.commit()
         flash(f'کاربر {user.name} با موفقیت بروزرسانی شد!', 'success')
@@ -0,0 +1,303 @@
+# app/search.py
+"""
+جستجوی متنی در عنوان فرم‌ها و مقادیر متنی پاسخ‌ها.
+
+هر فرم و هر پاسخ یک ردیف در search_entry داره (متن نرمال شده). این ردیف‌ها
+در همون flush که فرم/پاسخ ساخته یا عوض می‌شه نوشته می‌شن، پس ایندکس همیشه
+با داده‌ها در یک تراکنش است (create، fill، import).
+
+روی SQLite با FTS5 یک جدول مجازی search_fts (external content روی
+search_entry، با trigger) ساخته می‌شه و نتیجه‌ها با bm25 مرتب می‌شن. روی
+بقیه دیتابیس‌ها (یا SQLite بدون FTS5) جستجو با LIKE روی همون search_entry
+انجام می‌شه: کندتر، ولی بدون وابستگی.
+
+نرمال‌سازی فارسی (هم برای متن ذخیره شده و هم برای عبارت جستجو):
+    ي ى -> ی    ك -> ک    ة -> ه    أ إ آ -> ا
+    ارقام فارسی/عربی -> لاتین    اعراب و کشیده حذف    نیم‌فاصله -> فاصله
+جدول‌ها با migration شماره 6 ساخته و از داده‌های موجود پر می‌شن.
+"""
+import json
+import logging
+import re
+import time
+from markupsafe import Markup, escape
+from flask import current_app, has_app_context
+from sqlalchemy import column, event, func, inspect, literal_column, select, table, text
+from sqlalchemy.orm import Session
+from app.models import Form, FormResponse, SearchEntry
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'search_fts'
+
+_TRANSLATION = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ؤ': 'و',
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # ۰-۹
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # ٠-٩
+    '\u200c': ' ',  # نیم‌فاصله
+    '\u200d': '', '\u200e': '', '\u200f': '', '\u0640': '',  # ZWJ، جهت‌نماها، کشیده
+})
+# اعراب (فتحه، کسره، تشدید، ...)
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+_SPACES = re.compile(r'\s+')
+_TOKENS = re.compile(r'\w+')
+_ZWNJ_WORDS = re.compile('\\w+(?:\u200c\\w+)+')
+# مقادیری که متن نیستن (عدد، تاریخ، چک‌باکس)
+_NOT_TEXT = re.compile(r'^[\d\s.,:/+-]*$')
+_BOOLEANS = {'true', 'false', 'on', 'off'}
+
+# وضعیت جدول‌ها برای هر engine: (زمان بررسی، search_entry داره، FTS داره)
+_state = {}
+_RECHECK_SECONDS = 60
+
+
+def normalize(value):
+    """نرمال‌سازی متن فارسی/عربی برای ایندکس و جستجو"""
+    value = _DIACRITICS.sub('', str(value).translate(_TRANSLATION)).lower()
+    return _SPACES.sub(' ', value).strip()
+
+
+def index_text(value):
+    """
+    متن ذخیره شده در ایندکس؛ کلمه‌های نیم‌فاصله‌دار هم جدا و هم چسبیده
+    ذخیره می‌شن تا «می‌روم»، «می روم» و «میروم» هر سه پیدا بشن
+    """
+    body = normalize(value)
+    joined = [word.replace('\u200c', '') for word in _ZWNJ_WORDS.findall(str(value))]
+    if joined:
+        body += ' ' + normalize(' '.join(joined))
+    return body
+
+
+def response_text(values):
+    """متن قابل جستجوی یک پاسخ از روی مقادیر خانه‌ها"""
+    parts = []
+    for value in values:
+        if not isinstance(value, str) or _NOT_TEXT.match(value) or value.lower() in _BOOLEANS:
+            continue
+        parts.append(value)
+    return index_text(' '.join(parts))
+
+
+def _response_values(response):
+    if response.responses:
+        try:
+            return json.loads(response.responses).values()
+        except (TypeError, ValueError):
+            return ()
+    # RESPONSE_STORAGE='cells'
+    return [cell.text_value for cell in response.cells if cell.text_value]
+
+
+# ---------- ساخت جدول‌ها ----------
+
+def fts_available(conn):
+    """آیا SQLite این پردازه FTS5 داره"""
+    if conn.dialect.name != 'sqlite':
+        return False
+    options = {row[0] for row in conn.execute(text('PRAGMA compile_options'))}
+    return 'ENABLE_FTS5' in options
+
+
+def setup(conn):
+    """ساخت search_entry و (در صورت امکان) search_fts با triggerها؛ تکرارپذیر"""
+    SearchEntry.__table__.create(conn, checkfirst=True)
+    if not fts_available(conn):
+        return False
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"body, content='search_entry', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS search_entry_ai AFTER INSERT ON search_entry BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body); END"))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS search_entry_ad AFTER DELETE ON search_entry BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body); END"))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS search_entry_au AFTER UPDATE ON search_entry BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body); "
+        f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body); END"))
+    return True
+
+
+def drop(conn):
+    if conn.dialect.name == 'sqlite':
+        for trigger in ('search_entry_ai', 'search_entry_ad', 'search_entry_au'):
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+        conn.execute(text(f'DROP TABLE IF EXISTS {FTS_TABLE}'))
+    SearchEntry.__table__.drop(conn, checkfirst=True)
+
+
+def rebuild(conn, batch_size=1000):
+    """پر کردن دوباره search_entry از روی همه فرم‌ها و پاسخ‌ها؛ برگرداندن تعداد"""
+    entries = SearchEntry.__table__
+    conn.execute(entries.delete())
+    count = 0
+    rows = [{'kind': 'form', 'ref_id': form_id, 'form_id': form_id, 'body': index_text(title or '')}
+            for form_id, title in conn.execute(select(Form.id, Form.title))]
+    if rows:
+        conn.execute(entries.insert(), rows)
+        count += len(rows)
+
+    last_id = 0
+    while True:
+        batch = conn.execute(
+            select(FormResponse.id, FormResponse.form_id, FormResponse.responses)
+            .where(FormResponse.id > last_id).order_by(FormResponse.id).limit(batch_size)).all()
+        if not batch:
+            break
+        rows = []
+        for response_id, form_id, responses in batch:
+            try:
+                values = json.loads(responses).values() if responses else ()
+            except (TypeError, ValueError):
+                values = ()
+            rows.append({'kind': 'response', 'ref_id': response_id, 'form_id': form_id,
+                         'body': response_text(values)})
+        conn.execute(entries.insert(), rows)
+        count += len(rows)
+        last_id = batch[-1][0]
+    return count
+
+
+def _engine_state(conn):
+    key = conn.engine.url
+    state = _state.get(key)
+    if state is None or (not state[1] and time.monotonic() - state[0] > _RECHECK_SECONDS):
+        inspector = inspect(conn)
+        has_entries = inspector.has_table('search_entry')
+        state = (time.monotonic(), has_entries, has_entries and inspector.has_table(FTS_TABLE))
+        _state[key] = state
+    return state
+
+
+# ---------- به‌روزرسانی افزایشی ----------
+
+@event.listens_for(Session, 'after_flush')
+def _index_flushed(session, flush_context):
+    if not has_app_context() or not current_app.config.get('SEARCH_ENABLED', True):
+        return
+    added, updated, removed_forms, removed_responses = [], [], [], []
+    for obj in session.new:
+        if isinstance(obj, Form):
+            added.append({'kind': 'form', 'ref_id': obj.id, 'form_id': obj.id, 'body': index_text(obj.title or '')})
+        elif isinstance(obj, FormResponse):
+            added.append({'kind': 'response', 'ref_id': obj.id, 'form_id': obj.form_id,
+                          'body': response_text(_response_values(obj))})
+    for obj in session.dirty:
+        if isinstance(obj, Form) and inspect(obj).attrs.title.history.has_changes():
+            updated.append((obj.id, index_text(obj.title or '')))
+    for obj in session.deleted:
+        if isinstance(obj, Form):
+            removed_forms.append(obj.id)
+        elif isinstance(obj, FormResponse):
+            removed_responses.append(obj.id)
+    if not (added or updated or removed_forms or removed_responses):
+        return
+
+    conn = session.connection(bind_arguments={'mapper': Form.__mapper__})
+    if not _engine_state(conn)[1]:
+        # migration شماره 6 هنوز اجرا نشده
+        return
+    entries = SearchEntry.__table__
+    if added:
+        conn.execute(entries.insert(), added)
+    for form_id, body in updated:
+        conn.execute(entries.update()
+                     .where(entries.c.kind == 'form', entries.c.ref_id == form_id)
+                     .values(body=body))
+    if removed_forms:
+        conn.execute(entries.delete().where(entries.c.form_id.in_(removed_forms)))
+    if removed_responses:
+        conn.execute(entries.delete().where(entries.c.kind == 'response',
+                                            entries.c.ref_id.in_(removed_responses)))
+
+
+# ---------- جستجو ----------
+
+class SearchHit:
+    __slots__ = ('kind', 'ref_id', 'form_id', 'form_title', 'snippet')
+
+    def __init__(self, kind, ref_id, form_id, form_title, snippet):
+        self.kind = kind
+        self.ref_id = ref_id
+        self.form_id = form_id
+        self.form_title = form_title
+        self.snippet = snippet
+
+    def to_dict(self):
+        return {'kind': self.kind, 'id': self.ref_id, 'form_id': self.form_id,
+                'form_title': self.form_title, 'snippet': str(self.snippet)}
+
+
+def query_terms(query):
+    return _TOKENS.findall(normalize(query))
+
+
+def _fts_match(terms):
+    # هر کلمه با پیشوند ("فرم"*)؛ همه کلمه‌ها باید باشن
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+
+def _highlight(snippet):
+    """متن snippet امن می‌شه و فقط علامت‌های FTS به <mark> تبدیل می‌شن"""
+    html = str(escape(snippet))
+    return Markup(html.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def _like_snippet(body, terms, width=60):
+    position = min((body.find(term) for term in terms if term in body), default=0)
+    start = max(0, position - width // 2)
+    text_part = body[start:start + width]
+    for term in terms:
+        text_part = text_part.replace(term, f'{_MARK_START}{term}{_MARK_END}')
+    return ('…' if start else '') + text_part + ('…' if start + width < len(body) else '')
+
+
+def search(session, query, form_ids=None, include_responses=True, page=1, per_page=20):
+    """
+    جستجو؛ برگرداندن (لیست SearchHit، صفحه بعدی داره؟).
+    form_ids: کوئری/لیست شناسه فرم‌های مجاز (None = همه)
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+    entries = SearchEntry.__table__
+    conn = session.connection(bind_arguments={'mapper': Form.__mapper__})
+    _, has_entries, has_fts = _engine_state(conn)
+    if not has_entries:
+        return [], False
+
+    filters = []
+    if form_ids is not None:
+        filters.append(entries.c.form_id.in_(form_ids))
+    if not include_responses:
+        filters.append(entries.c.kind == 'form')
+
+    if has_fts:
+        fts = table(FTS_TABLE, column('rowid'))
+        fts_column = literal_column(FTS_TABLE)
+        stmt = (select(entries.c.kind, entries.c.ref_id, entries.c.form_id, Form.title,
+                       func.snippet(fts_column, 0, _MARK_START, _MARK_END, '…', 12))
+                .select_from(fts.join(entries, entries.c.id == fts.c.rowid))
+                .join(Form, Form.id == entries.c.form_id)
+                .where(fts_column.op('MATCH')(_fts_match(terms)), *filters)
+                .order_by(func.bm25(fts_column), entries.c.id.desc()))
+    else:
+        stmt = (select(entries.c.kind, entries.c.ref_id, entries.c.form_id, Form.title, entries.c.body)
+                .join(Form, Form.id == entries.c.form_id)
+                .where(*[entries.c.body.contains(term, autoescape=True) for term in terms], *filters)
+                # فرم‌ها قبل از پاسخ‌ها، جدیدترها اول
+                .order_by(entries.c.kind, entries.c.id.desc()))
+
+    rows = session.execute(stmt.limit(per_page + 1).offset((page - 1) * per_page)).all()
+    hits = []
+    for kind, ref_id, form_id, title, snippet in rows[:per_page]:
+        if not has_fts:
+            snippet = _like_snippet(snippet, terms)
+        hits.append(SearchHit(kind, ref_id, form_id, title, _highlight(snippet)))
+    return hits, len(rows) > per_page
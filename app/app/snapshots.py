@@ -0,0 +1,433 @@
+# app/snapshots.py
+"""
+اسنپ‌شات ستونی پاسخ‌های یک فرم برای گزارش‌گیری سنگین.
+
+برای هر فرم یک پوشه ساخته می‌شه که برای هر ستون جدول یک آرایه تایپ‌دار
+(به علاوه آرایه‌های id پاسخ، کاربر و زمان ثبت) داره. در آرایه هر ستون،
+خانه‌های سطرهای یک پاسخ پشت سر هم هستن: عنصر (پاسخ i، سطر r) در
+i * rows + r قرار داره، پس آرایه هر خانه یک برش با گام rows است
+(Snapshot.cell). ابزارهای تحلیل و
+صفحه‌های گزارش این فایل‌ها رو memory-map می‌کنن و دیگه JSON رو از SQLite
+parse نمی‌کنن. ساخت دوباره افزایشی است: فقط پاسخ‌هایی که id بزرگ‌تر از
+آخرین پاسخ اسنپ‌شات دارن اضافه می‌شن.
+
+وقتی ساختار فرم عوض شده و اسنپ‌شات از اول ساخته می‌شه، ساخت در یک پوشه
+کناری انجام می‌شه و در آخر با rename جای پوشه قبلی می‌نشینه؛ خواننده‌ها
+در این مدت اسنپ‌شات قبلی رو کامل می‌بینن. Snapshot.open همه فایل‌ها رو
+همون لحظه map می‌کنه، پس جابه‌جا یا حذف شدن پوشه بعد از اون روی خواندن
+اثری نداره.
+
+نوع آرایه هر خانه بر اساس نوع ستون:
+    number   -> float64 ('d')، خالی = NaN
+    checkbox -> int8 ('b')، ۱ یا ۰
+    date     -> int32 ('i')، شماره روز (date.toordinal)، خالی = ۰
+    select/radio -> int32 ('i')، کد گزینه در dictionary، خالی = -۱
+    text     -> offsets از نوع int64 ('q') + بایت‌های utf-8
+"""
+import json
+import math
+import mmap
+import os
+import shutil
+import sys
+import time
+from array import array
+from datetime import date, datetime, timezone
+from app.export import iter_responses
+from app.structures import structure_hash
+
+try:
+    import fcntl
+except ImportError:  # ویندوز
+    fcntl = None
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+# نوع ستون -> (نوع آرایه, مقدار خالی)
+CELL_ARRAYS = {
+    'number': ('d', math.nan),
+    'checkbox': ('b', 0),
+    'date': ('i', 0),
+    'select': ('i', -1),
+    'radio': ('i', -1),
+}
+
+
+def snapshot_path(folder, form_id):
+    return os.path.join(folder, f'form_{form_id}')
+
+
+def load_meta(path):
+    try:
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(path, meta):
+    # اول فایل موقت، بعد replace؛ خواننده‌ها همیشه یک meta کامل می‌بینن
+    tmp = os.path.join(path, META_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+
+def _new_meta(form, structure):
+    columns = structure.get('columns', []) if isinstance(structure, dict) else []
+    rows = structure.get('rows', 0) if isinstance(structure, dict) else 0
+    arrays = {
+        'response_id': {'typecode': 'q', 'per_response': 1},
+        'user_id': {'typecode': 'q', 'per_response': 1},
+        'filled_at': {'typecode': 'd', 'per_response': 1},
+    }
+    dictionaries = {}
+    for col, column in enumerate(columns):
+        name = f'col_{col}'
+        col_type = column.get('type', 'text')
+        if col_type not in CELL_ARRAYS:
+            col_type = 'text'
+        typecode = CELL_ARRAYS[col_type][0] if col_type != 'text' else 'q'
+        arrays[name] = {'typecode': typecode, 'type': col_type, 'col': col, 'per_response': rows}
+        if col_type in ('select', 'radio'):
+            dictionaries[name] = [str(option) for option in column.get('options', [])]
+    return {
+        'version': FORMAT_VERSION,
+        'form_id': form.id,
+        'structure_hash': structure_hash(form.structure),
+        'byteorder': sys.byteorder,
+        'rows': rows,
+        'columns': [{'name': c.get('name'), 'type': c.get('type', 'text')} for c in columns],
+        'count': 0,
+        'last_response_id': 0,
+        'built_at': None,
+        'arrays': arrays,
+        'dictionaries': dictionaries,
+    }
+
+
+def _array_file(path, name):
+    return os.path.join(path, name + '.bin')
+
+
+def _text_file(path, name):
+    return os.path.join(path, name + '.txt')
+
+
+def _truncate(path, meta):
+    """دور ریختن داده‌های نیمه‌کاره‌ای که بعد از آخرین meta نوشته شدن"""
+    for name, spec in meta['arrays'].items():
+        count = meta['count'] * spec['per_response']
+        itemsize = array(spec['typecode']).itemsize
+        filename = _array_file(path, name)
+        with open(filename, 'ab') as f:
+            f.truncate(count * itemsize)
+        if spec.get('type') == 'text':
+            end = 0
+            if count:
+                with open(filename, 'rb') as f:
+                    f.seek((count - 1) * itemsize)
+                    offsets = array('q')
+                    offsets.frombytes(f.read(itemsize))
+                    end = offsets[0]
+            with open(_text_file(path, name), 'ab') as f:
+                f.truncate(end)
+
+
+def _encode(spec, value, dictionary):
+    col_type = spec['type']
+    if value in (None, ''):
+        return CELL_ARRAYS[col_type][1]
+    if col_type == 'number':
+        try:
+            return float(value)
+        except ValueError:
+            return math.nan
+    if col_type == 'checkbox':
+        return 1 if value == 'true' else 0
+    if col_type == 'date':
+        try:
+            return date.fromisoformat(value).toordinal()
+        except ValueError:
+            return 0
+    # select / radio
+    value = str(value)
+    try:
+        return dictionary.index(value)
+    except ValueError:
+        dictionary.append(value)
+        return len(dictionary) - 1
+
+
+def _dir_id(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+def _lock(path):
+    # قفل کنار پوشه (نه داخلش) تا با جابه‌جا شدن پوشه عوض نشه
+    handle = open(path + '.lock', 'w')
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+    return handle
+
+
+def _create_files(path, meta):
+    os.makedirs(path)
+    for name, spec in meta['arrays'].items():
+        open(_array_file(path, name), 'wb').close()
+        if spec.get('type') == 'text':
+            open(_text_file(path, name), 'wb').close()
+
+
+def _swap(path, new_path):
+    """گذاشتن پوشه کامل new_path به جای path"""
+    old_path = f'{path}.old-{os.getpid()}'
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(new_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def build_snapshot(form, folder, batch_size=1000):
+    """
+    ساخت یا به‌روزرسانی اسنپ‌شات فرم؛ تعداد پاسخ‌های اضافه شده رو برمی‌گردونه.
+    اگر ساختار فرم عوض شده باشه اسنپ‌شات از اول ساخته می‌شه.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = snapshot_path(folder, form.id)
+    lock = _lock(path)
+    try:
+        meta = load_meta(path)
+        if (meta is not None and meta.get('version') == FORMAT_VERSION
+                and meta.get('structure_hash') == structure_hash(form.structure)
+                and meta.get('byteorder') == sys.byteorder):
+            _truncate(path, meta)
+            added = _append(path, meta, form.id, batch_size)
+            meta['built_at'] = datetime.now(timezone.utc).isoformat()
+            _write_meta(path, meta)
+            return added
+
+        # ساخت کامل در پوشه کناری؛ تا rename آخر، پوشه فعلی دست نمی‌خوره
+        new_path = f'{path}.new-{os.getpid()}'
+        shutil.rmtree(new_path, ignore_errors=True)
+        try:
+            meta = _new_meta(form, form.get_structure())
+            _create_files(new_path, meta)
+            added = _append(new_path, meta, form.id, batch_size)
+            meta['built_at'] = datetime.now(timezone.utc).isoformat()
+            _write_meta(new_path, meta)
+            _swap(path, new_path)
+        finally:
+            shutil.rmtree(new_path, ignore_errors=True)
+        return added
+    finally:
+        lock.close()
+
+
+def _append(path, meta, form_id, batch_size):
+    arrays = meta['arrays']
+    files = {name: open(_array_file(path, name), 'ab') for name in arrays}
+    texts = {name: open(_text_file(path, name), 'ab')
+             for name, spec in arrays.items() if spec.get('type') == 'text'}
+    text_end = {name: f.tell() for name, f in texts.items()}
+
+    added = 0
+    try:
+        batch = []
+        for row in iter_responses(form_id, after_id=meta['last_response_id'], batch_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _write_batch(batch, meta, files, texts, text_end)
+                added += len(batch)
+                batch = []
+        if batch:
+            _write_batch(batch, meta, files, texts, text_end)
+            added += len(batch)
+        for f in list(files.values()) + list(texts.values()):
+            f.flush()
+            os.fsync(f.fileno())
+    finally:
+        for f in list(files.values()) + list(texts.values()):
+            f.close()
+    return added
+
+
+def _write_batch(batch, meta, files, texts, text_end):
+    rows = meta['rows']
+    array('q', [response.id for response in batch]).tofile(files['response_id'])
+    array('q', [response.user_id for response in batch]).tofile(files['user_id'])
+    array('d', [response.filled_at.replace(tzinfo=timezone.utc).timestamp()
+                if response.filled_at else math.nan
+                for response in batch]).tofile(files['filled_at'])
+
+    for name, spec in meta['arrays'].items():
+        if 'col' not in spec:
+            continue
+        keys = [f"cell_{row}_{spec['col']}" for row in range(rows)]
+        if spec['type'] == 'text':
+            offsets = array('q')
+            chunk = bytearray()
+            for response in batch:
+                for key in keys:
+                    chunk += str(response.data.get(key) or '').encode('utf-8')
+                    offsets.append(text_end[name] + len(chunk))
+            texts[name].write(chunk)
+            text_end[name] += len(chunk)
+            offsets.tofile(files[name])
+        else:
+            dictionary = meta['dictionaries'].get(name)
+            array(spec['typecode'], [_encode(spec, response.data.get(key), dictionary)
+                                     for response in batch
+                                     for key in keys]).tofile(files[name])
+
+    meta['count'] += len(batch)
+    meta['last_response_id'] = batch[-1].id
+
+
+class TextColumn:
+    """ستون متنی memory-map شده؛ با ایندکس، رشته برمی‌گردونه"""
+
+    def __init__(self, offsets, data):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        start = self._offsets[index - 1] if index else 0
+        return bytes(self._data[start:self._offsets[index]]).decode('utf-8')
+
+
+class Snapshot:
+    """
+    خواندن اسنپ‌شات با mmap:
+
+        with Snapshot.open(folder, form_id) as snap:
+            amounts = snap.cell(0, 1)   # memoryview از float64، یک عنصر برای هر پاسخ
+
+    memoryviewهایی که array و cell برمی‌گردونن با close آزاد می‌شن و بعدش
+    قابل استفاده نیستن؛ اگر صدا زننده خودش از اون‌ها view دیگه‌ای (مثلاً
+    برش یا cast) ساخته باشه، باید قبل از close آزادش کنه وگرنه close
+    BufferError می‌ده.
+    """
+
+    # تلاش دوباره وقتی وسط باز کردن، پوشه با ساخت کامل جابه‌جا شده
+    OPEN_ATTEMPTS = 3
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.count = meta['count']
+        self.rows = meta['rows']
+        self._maps = []
+        self._views = []
+        self._arrays = {}
+
+    @classmethod
+    def open(cls, folder, form_id):
+        path = snapshot_path(folder, form_id)
+        for _ in range(cls.OPEN_ATTEMPTS):
+            # ساخت کامل پوشه رو عوض می‌کنه (inode جدید)؛ اگر بین خواندن meta و
+            # map کردن فایل‌ها عوض شده باشه، فایل‌ها مال meta دیگه‌ای هستن
+            generation = _dir_id(path)
+            meta = load_meta(path)
+            if meta is not None and meta.get('byteorder') != sys.byteorder:
+                return None
+            if meta is not None:
+                snap = cls(path, meta)
+                try:
+                    snap._map_all()
+                    if generation is not None and _dir_id(path) == generation:
+                        return snap
+                except (OSError, ValueError):
+                    # فایل‌ها با meta خونده شده نمی‌خونن (پوشه همین الان عوض شد)
+                    pass
+                snap.close()
+            time.sleep(0.05)
+        return None
+
+    def _track(self, view):
+        self._views.append(view)
+        return view
+
+    def _map(self, filename, length):
+        if length == 0:
+            return memoryview(b'')
+        with open(filename, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return self._track(memoryview(mapped))
+
+    def _map_all(self):
+        for name, spec in self.meta['arrays'].items():
+            typecode = spec['typecode']
+            length = self.count * spec['per_response']
+            view = self._map(_array_file(self.path, name), length * array(typecode).itemsize)
+            values = self._track(view.cast(typecode)) if length else array(typecode)
+            if spec.get('type') == 'text':
+                end = values[-1] if length else 0
+                values = TextColumn(values, self._map(_text_file(self.path, name), end))
+            self._arrays[name] = values
+
+    def array(self, name):
+        """کل آرایه (response_id، user_id، filled_at یا col_<c>)"""
+        if name not in self.meta['arrays']:
+            raise KeyError(name)
+        return self._arrays[name]
+
+    def cell(self, row, col):
+        """مقادیر خانه (row, col) در همه پاسخ‌ها"""
+        values = self.array(f'col_{col}')
+        if isinstance(values, memoryview):
+            return self._track(values[row::self.rows])
+        return values[row::self.rows]
+
+    def decode(self, col, value):
+        """تبدیل مقدار خام به مقدار قابل نمایش (گزینه، تاریخ، ...)"""
+        name = f'col_{col}'
+        col_type = self.meta['arrays'][name].get('type')
+        if col_type in ('select', 'radio'):
+            return self.meta['dictionaries'][name][value] if value >= 0 else None
+        if col_type == 'date':
+            return date.fromordinal(value) if value else None
+        if col_type == 'number':
+            return None if math.isnan(value) else value
+        return value
+
+    def number_summary(self, col, row=None):
+        values = self.array(f'col_{col}') if row is None else self.cell(row, col)
+        values = [v for v in values if not math.isnan(v)]
+        if not values:
+            return {'count': 0}
+        total = math.fsum(values)
+        return {'count': len(values), 'sum': total, 'avg': total / len(values),
+                'min': min(values), 'max': max(values)}
+
+    def close(self):
+        # اول viewهایی که خودمون ساختیم، بعد mapها؛ view ساخته شده توسط صدا زننده
+        # که هنوز آزاد نشده BufferError می‌ده (پنهان نمی‌شه، وگرنه map و فایلش نشت می‌کنن)
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._arrays = {}
+        maps, self._maps = self._maps, []
+        for mapped in maps:
+            mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
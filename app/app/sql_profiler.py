@@ -0,0 +1,184 @@
+# app/sql_profiler.py
+"""
+اندازه‌گیری کوئری‌های SQL هر درخواست (اختیاری؛ SQL_PROFILING=1).
+
+با رویدادهای engine در SQLAlchemy برای هر درخواست شمرده می‌شه:
+تعداد کوئری‌ها، زمان کل دیتابیس و تعداد تکرار هر «شکل» کوئری (متن SQL با
+پارامترهای جدا). اگر یک SELECT یکسان بیشتر از SQL_NPLUSONE_THRESHOLD بار
+با پارامترهای متفاوت اجرا بشه، احتمالاً N+1 است و گزارش می‌شه.
+
+نتیجه هر درخواست:
+    - هدر X-SQL-Profile (مثلاً "queries=12; db_ms=8.4; n_plus_one=1")
+    - لاگ (هشدار برای N+1)
+    - آمار تجمعی هر endpoint در حافظه پردازه برای صفحه /settings/sql
+"""
+import logging
+import re
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# SQL هر شکل کوئری در گزارش‌ها حداکثر این طول رو داره
+STATEMENT_PREVIEW = 300
+# برای هر شکل کوئری حداکثر این تعداد پارامتر متفاوت نگه داشته می‌شه
+MAX_DISTINCT_PARAMS = 1000
+
+
+class RequestProfile:
+    """کوئری‌های یک درخواست"""
+
+    __slots__ = ('count', 'db_time', 'shapes')
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        # متن SQL -> [تعداد, زمان, مجموعه پارامترهای متفاوت]
+        self.shapes = {}
+
+    def record(self, statement, parameters, elapsed):
+        self.count += 1
+        self.db_time += elapsed
+        shape = self.shapes.get(statement)
+        if shape is None:
+            shape = self.shapes[statement] = [0, 0.0, set()]
+        shape[0] += 1
+        shape[1] += elapsed
+        if len(shape[2]) < MAX_DISTINCT_PARAMS:
+            try:
+                shape[2].add(hash(repr(parameters)))
+            except Exception:
+                pass
+
+    def n_plus_one(self, threshold):
+        """[(SQL, تعداد اجرا, تعداد پارامتر متفاوت)] برای SELECTهای مشکوک"""
+        suspects = []
+        for statement, (count, _, params) in self.shapes.items():
+            if count > threshold and len(params) > 1 and statement.lstrip()[:6].upper() == 'SELECT':
+                suspects.append((statement, count, len(params)))
+        suspects.sort(key=lambda item: item[1], reverse=True)
+        return suspects
+
+
+class EndpointStats:
+    """آمار تجمعی یک endpoint در این پردازه"""
+
+    __slots__ = ('requests', 'queries', 'max_queries', 'db_time', 'n_plus_one', 'worst_statement')
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_time = 0.0
+        self.n_plus_one = 0
+        self.worst_statement = None
+
+    @property
+    def avg_queries(self):
+        return self.queries / self.requests if self.requests else 0
+
+    @property
+    def avg_db_ms(self):
+        return self.db_time * 1000 / self.requests if self.requests else 0
+
+
+_SELECT_LIST = re.compile(r'^\s*SELECT\s.*?\sFROM\s', re.IGNORECASE | re.DOTALL)
+
+
+def preview(statement):
+    """خلاصه SQL برای گزارش: لیست ستون‌های SELECT حذف می‌شه تا FROM/WHERE دیده بشه"""
+    statement = _SELECT_LIST.sub('SELECT ... FROM ', statement, count=1)
+    return ' '.join(statement.split())[:STATEMENT_PREVIEW]
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def current_profile():
+    """پروفایل درخواست جاری (یا None بیرون از درخواست / وقتی غیرفعال است)"""
+    if not has_request_context():
+        return None
+    return g.get('_sql_profile')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_sql_profile_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_sql_profile_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    profile = current_profile()
+    if profile is not None:
+        profile.record(statement, parameters, elapsed)
+
+
+def _start_request():
+    g._sql_profile = RequestProfile()
+
+
+def _finish_request(response):
+    profile = g.pop('_sql_profile', None)
+    if profile is None:
+        return response
+
+    threshold = current_app.config.get('SQL_NPLUSONE_THRESHOLD', 5)
+    suspects = profile.n_plus_one(threshold)
+    endpoint = request.endpoint or request.path
+
+    if current_app.config.get('SQL_PROFILE_HEADER', True):
+        response.headers['X-SQL-Profile'] = (
+            f'queries={profile.count}; db_ms={profile.db_time * 1000:.1f}; n_plus_one={len(suspects)}'
+        )
+
+    for statement, count, distinct in suspects:
+        logger.warning('N+1 احتمالی در %s: %d بار (%d پارامتر متفاوت): %s',
+                       endpoint, count, distinct, preview(statement))
+    logger.debug('SQL %s: %d کوئری، %.1fms', endpoint, profile.count, profile.db_time * 1000)
+
+    with _endpoints_lock:
+        stats = _endpoints.get(endpoint)
+        if stats is None:
+            stats = _endpoints[endpoint] = EndpointStats()
+        stats.requests += 1
+        stats.queries += profile.count
+        stats.db_time += profile.db_time
+        if profile.count >= stats.max_queries:
+            stats.max_queries = profile.count
+        if suspects:
+            stats.n_plus_one += 1
+            stats.worst_statement = preview(suspects[0][0])
+    return response
+
+
+def worst_endpoints(limit=50, order_by='avg_queries'):
+    """[(endpoint, EndpointStats)] مرتب شده، بدترین اول"""
+    with _endpoints_lock:
+        items = list(_endpoints.items())
+    items.sort(key=lambda item: getattr(item[1], order_by), reverse=True)
+    return items[:limit]
+
+
+def reset_stats():
+    with _endpoints_lock:
+        _endpoints.clear()
+
+
+def init_app(app):
+    if not app.config.get('SQL_PROFILING'):
+        return
+    from app import db
+    with app.app_context():
+        engines = list(db.engines.values())
+    # همه engineها (اصلی و bindهایی مثل replica)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    # اول از همه before_requestها، تا کوئری‌های آن‌ها هم شمرده بشن
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,88 @@
+# app/structures.py
+"""
+کش ساختار parse شده فرم‌ها.
+
+ساختار فرم‌های جدولی بزرگ (با default_data صدها سطری) ده‌ها کیلوبایت JSON
+است و قبلاً در هر درخواست fill/view/responses دوباره parse می‌شد. اینجا
+ساختار یک بار parse و ایندکس می‌شه (نوع ستون‌ها، ستون‌های قابل ویرایش،
+گزینه‌ها، جدول مقادیر پیش‌فرض) و در یک کش LRU با کلید
+(id فرم, hash متن ساختار) نگه داشته می‌شه؛ هر تغییری در متن ساختار
+کلید جدید می‌سازه و نسخه قدیمی خودش از LRU بیرون می‌ره.
+
+ساختارها بین درخواست‌ها مشترک هستن و نباید تغییر داده بشن.
+"""
+import hashlib
+import json
+from app.cache import LocalCache
+
+_structures = LocalCache('form_structures', maxsize=256)
+
+EMPTY_STRUCTURE = {'rows': 0, 'columns': [], 'default_data': []}
+
+
+def structure_hash(structure_text):
+    return hashlib.sha1((structure_text or '').encode('utf-8')).hexdigest()
+
+
+class FormStructure:
+    """ساختار parse شده یک فرم به همراه ایندکس‌های آماده"""
+
+    __slots__ = ('data', 'hash', 'rows', 'columns', 'column_types', 'editable',
+                 'required', 'options', 'option_sets', 'default_grid', 'cell_keys')
+
+    def __init__(self, data, hash):
+        self.data = data
+        self.hash = hash
+        columns = data.get('columns', []) if isinstance(data, dict) else []
+        self.rows = data.get('rows', 0) if isinstance(data, dict) else 0
+        self.columns = columns
+        self.column_types = tuple(col.get('type', 'text') for col in columns)
+        self.editable = tuple(bool(col.get('editable_by_user', True)) for col in columns)
+        self.required = tuple(bool(col.get('required')) for col in columns)
+        self.options = tuple(tuple(col.get('options') or ()) for col in columns)
+        self.option_sets = tuple(frozenset(options) for options in self.options)
+
+        # default_data همیشه rows × columns (سطر/خانه نداشته = '')
+        default_data = data.get('default_data') if isinstance(data, dict) else None
+        default_data = default_data or []
+        grid = []
+        for row in range(self.rows):
+            values = default_data[row] if row < len(default_data) and default_data[row] else []
+            grid.append(tuple(values[col] if col < len(values) else '' for col in range(len(columns))))
+        self.default_grid = tuple(grid)
+
+        self.cell_keys = tuple(
+            tuple(f'cell_{row}_{col}' for col in range(len(columns)))
+            for row in range(self.rows)
+        )
+
+    def default_value(self, row, col):
+        return self.default_grid[row][col]
+
+
+def parse_structure(structure_text):
+    """متن JSON -> FormStructure (بدون کش)؛ JSON نامعتبر ValueError می‌ده"""
+    data = json.loads(structure_text) if structure_text else []
+    return FormStructure(data, structure_hash(structure_text))
+
+
+def get_form_structure(form):
+    """FormStructure فرم از کش؛ اگر نبود parse و ذخیره می‌شه"""
+    key = (form.id, structure_hash(form.structure))
+    structure = _structures.get(key)
+    if structure is None:
+        structure = parse_structure(form.structure)
+        _structures.set(key, structure)
+    return structure
+
+
+def load_structure(form):
+    """dict ساختار فرم برای قالب‌ها؛ اگر JSON خراب باشه ساختار خالی"""
+    try:
+        return get_form_structure(form).data
+    except ValueError:
+        return EMPTY_STRUCTURE
+
+
+def init_app(app):
+    _structures.maxsize = app.config.get('FORM_STRUCTURE_CACHE_SIZE', 256)
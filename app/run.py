@@ -1,5 +1,10 @@
 from app import create_app
-app = create_app()
 
+# پردازه‌های هش رمز (app/passwords.py) این فایل رو به اسم __mp_main__ دوباره
+# import می‌کنن؛ برنامه فقط در پردازه اصلی ساخته می‌شه
+if __name__ != '__mp_main__':
+    app = create_app()
+
+# فقط برای توسعه؛ در محیط عملیاتی: python serve.py
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,69 @@
+# scripts/backfill_response_cells.py
+"""
+پر کردن جدول response_cell برای پاسخ‌های قدیمی (ثبت شده قبل از فعال شدن
+RESPONSE_STORAGE='both').
+
+    python scripts/backfill_response_cells.py [--batch-size 500]
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# اضافه کردن مسیر پروژه
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app import create_app, db
+from app.models import Form, FormResponse, ResponseCell
+from app.responses import build_cells
+
+
+def backfill(batch_size):
+    structures = {}
+    has_cells = db.session.query(ResponseCell.response_id).distinct()
+    last_id = 0
+    total = 0
+
+    while True:
+        batch = (FormResponse.query
+                 .filter(FormResponse.id > last_id, ~FormResponse.id.in_(has_cells))
+                 .order_by(FormResponse.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+
+        for response in batch:
+            if response.form_id not in structures:
+                form = db.session.get(Form, response.form_id)
+                structures[response.form_id] = form.get_structure() if form else {}
+            try:
+                data = response.get_data()
+            except ValueError:
+                print(f"⚠️ پاسخ {response.id}: JSON نامعتبر - نادیده گرفته شد")
+                continue
+            for cell in build_cells(response.form_id, structures[response.form_id], data):
+                cell.response_id = response.id
+                db.session.add(cell)
+
+        last_id = batch[-1].id
+        total += len(batch)
+        db.session.commit()
+        print(f"   ➕ {total} پاسخ پردازش شد (تا id={last_id})")
+
+    print(f"✅ پایان: {total} پاسخ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill response_cell from JSON responses')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        backfill(args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# scripts/bench_db.py
+"""
+مقایسه توان دیتابیس با پروفایل‌های مختلف (app/database.py).
+
+روی یک دیتابیس موقت (نه instance/app.db) چند thread نویسنده پاسخ فرم ثبت
+می‌کنن (مثل POST /form/fill) و هم‌زمان چند thread خواننده صفحه پاسخ‌ها رو
+می‌خونن. هر پروفایل در یک پردازه جدا اجرا می‌شه.
+
+    python scripts/bench_db.py                       # plain و tuned
+    python scripts/bench_db.py --writers 8 --readers 8 --seconds 10
+    python scripts/bench_db.py --profiles tuned --database-url postgresql://...
+"""
+import sys
+import os
+import json
+import argparse
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# اضافه کردن مسیر پروژه
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+STRUCTURE = {
+    'rows': 5,
+    'columns': [
+        {'name': 'نام', 'type': 'text', 'editable_by_user': True},
+        {'name': 'تعداد', 'type': 'number', 'editable_by_user': True},
+        {'name': 'وضعیت', 'type': 'select', 'options': ['خوب', 'بد'], 'editable_by_user': True},
+    ],
+}
+
+
+def run_profile(args):
+    """اجرای بنچمارک در همین پردازه (DB_PROFILE و DATABASE_URL از محیط)"""
+    from sqlalchemy.exc import OperationalError
+    from app import create_app, db
+    from app.models import Form, FormResponse, Role, User
+    from app.responses import create_form_response
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        role = Role.query.filter_by(name='bench').first() or Role(name='bench')
+        db.session.add(role)
+        db.session.flush()
+        user = User(username=f'bench_{os.getpid()}', name='bench', mobile='0', role_id=role.id, password_hash='-')
+        db.session.add(user)
+        form = Form(title='bench', structure=json.dumps(STRUCTURE, ensure_ascii=False), created_by=None)
+        db.session.add(form)
+        db.session.commit()
+        user_id, form_id = user.id, form.id
+
+    counts = {'writes': 0, 'reads': 0, 'errors': 0}
+    latencies = {'writes': [], 'reads': []}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + args.seconds
+
+    def writer(n):
+        with app.app_context():
+            form = db.session.get(Form, form_id)
+            i = 0
+            while time.monotonic() < stop_at:
+                data = {f'cell_{r}_0': f'w{n}-{i}' for r in range(5)}
+                data.update({f'cell_{r}_1': str(i) for r in range(5)})
+                start = time.perf_counter()
+                try:
+                    create_form_response(form, user_id, data)
+                    db.session.commit()
+                    kind = 'writes'
+                except OperationalError:
+                    db.session.rollback()
+                    kind = 'errors'
+                elapsed = time.perf_counter() - start
+                with lock:
+                    counts[kind] += 1
+                    if kind != 'errors':
+                        latencies[kind].append(elapsed)
+                i += 1
+
+    def reader():
+        with app.app_context():
+            while time.monotonic() < stop_at:
+                start = time.perf_counter()
+                try:
+                    (FormResponse.query.filter_by(form_id=form_id)
+                     .order_by(FormResponse.filled_at.desc(), FormResponse.id.desc())
+                     .limit(20).all())
+                    FormResponse.query.filter_by(form_id=form_id).count()
+                    db.session.rollback()
+                    kind = 'reads'
+                except OperationalError:
+                    db.session.rollback()
+                    kind = 'errors'
+                elapsed = time.perf_counter() - start
+                with lock:
+                    counts[kind] += 1
+                    if kind != 'errors':
+                        latencies[kind].append(elapsed)
+
+    threads = ([threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+               + [threading.Thread(target=reader) for _ in range(args.readers)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def p95(values):
+        values = sorted(values)
+        return round(values[int(len(values) * 0.95)] * 1000, 2) if values else None
+
+    print(json.dumps({
+        'writes_per_s': round(counts['writes'] / args.seconds, 1),
+        'reads_per_s': round(counts['reads'] / args.seconds, 1),
+        'errors': counts['errors'],
+        'write_p95_ms': p95(latencies['writes']),
+        'read_p95_ms': p95(latencies['reads']),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark database engine profiles')
+    parser.add_argument('--profiles', default='plain,tuned')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--database-url', help='default: a fresh temporary SQLite file per profile')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_profile(args)
+        return
+
+    print(f"🏁 {args.writers} نویسنده، {args.readers} خواننده، {args.seconds} ثانیه برای هر پروفایل")
+    for profile in args.profiles.split(','):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DB_PROFILE=profile, LOG_LEVEL='WARNING', METRICS_ENABLED='0',
+                       DATABASE_URL=args.database_url or 'sqlite:///' + os.path.join(tmp, 'bench.db'))
+            result = subprocess.run(
+                [sys.executable, __file__, '--run', '--writers', str(args.writers),
+                 '--readers', str(args.readers), '--seconds', str(args.seconds)],
+                env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"❌ {profile}:\n{result.stderr}")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"   {profile:6} نوشتن: {stats['writes_per_s']}/s (p95 {stats['write_p95_ms']}ms)  "
+              f"خواندن: {stats['reads_per_s']}/s (p95 {stats['read_p95_ms']}ms)  خطا: {stats['errors']}")
+
+
+if __name__ == '__main__':
+    main()
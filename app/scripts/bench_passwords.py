@@ -0,0 +1,107 @@
+# scripts/bench_passwords.py
+"""
+توان ورود (بررسی رمز) بر حسب تعداد پردازه‌های هش (app/passwords.py).
+
+چند thread هم‌زمان (مثل درخواست‌های ورود اول شیفت) رمز رو بررسی می‌کنن؛
+یک بار در همون thread (inline، رفتار قبلی) و بعد با pool های 1، 2، 4 ...
+تا تعداد هسته‌ها. در کنارش یک thread «درخواست سبک» هم اجرا می‌شه تا
+تأخیر بقیه درخواست‌ها در زمان شلوغی ورود دیده بشه.
+
+    python scripts/bench_passwords.py
+    python scripts/bench_passwords.py --method pbkdf2:sha256:600000 --logins 200 --threads 32
+"""
+import sys
+import os
+import argparse
+import threading
+import time
+from pathlib import Path
+
+# اضافه کردن مسیر پروژه
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.passwords import PasswordHasher
+
+
+def light_request():
+    # کار کوچکی شبیه رندر یک صفحه ساده
+    return sum(i * i for i in range(2000))
+
+
+def run(hasher, stored, args):
+    remaining = [args.logins]
+    lock = threading.Lock()
+    latencies = []
+    light = []
+    done = threading.Event()
+
+    def login_worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            assert hasher.verify(stored, 'secret-password')
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    def light_worker():
+        while not done.is_set():
+            start = time.perf_counter()
+            light_request()
+            light.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    hasher.start()
+    threads = [threading.Thread(target=login_worker) for _ in range(args.threads)]
+    observer = threading.Thread(target=light_worker)
+    start = time.perf_counter()
+    observer.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    observer.join()
+    hasher.shutdown()
+
+    def p95(values):
+        values = sorted(values)
+        return values[int(len(values) * 0.95)] * 1000 if values else 0
+
+    return args.logins / elapsed, p95(latencies), p95(light)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark password hashing throughput')
+    parser.add_argument('--method', default='scrypt:32768:8:1')
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=16, help='concurrent login requests')
+    parser.add_argument('--workers', help='comma separated pool sizes (default: 1,2,4,... up to cores)')
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if args.workers:
+        sizes = [int(n) for n in args.workers.split(',')]
+    else:
+        sizes, n = [], 1
+        while n < cores:
+            sizes.append(n)
+            n *= 2
+        sizes.append(cores)
+
+    stored = PasswordHasher(args.method).hash('secret-password')
+    print(f"🔐 {args.method}، {args.logins} ورود با {args.threads} thread هم‌زمان، {cores} هسته")
+    print(f"   {'pool':>8} {'ورود/ثانیه':>12} {'p95 ورود':>12} {'p95 درخواست سبک':>18}")
+    for workers in [0] + sizes:
+        hasher = PasswordHasher(args.method, workers=workers, queue_size=args.threads)
+        rate, login_p95, light_p95 = run(hasher, stored, args)
+        label = 'inline' if not workers else str(workers)
+        print(f"   {label:>8} {rate:>12.1f} {login_p95:>10.0f}ms {light_p95:>16.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
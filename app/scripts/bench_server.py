@@ -0,0 +1,176 @@
+# scripts/bench_server.py
+"""
+مقایسه سرور توسعه (run.py) با سرور pre-fork (serve.py) روی همین ماشین.
+
+روی یک دیتابیس موقت (نه instance/app.db) یک کاربر و چند فرم ساخته می‌شه،
+هر سرور در یک پردازه جدا روی پورت محلی بالا میاد و چند کلاینت هم‌زمان
+(هر کدوم با session خودش بعد از ورود) صفحه‌ها رو درخواست می‌کنن.
+
+    python scripts/bench_server.py
+    python scripts/bench_server.py --workers 4 --threads 8 --clients 32 --seconds 10
+    python scripts/bench_server.py --paths /dashboard,/form/list,/search?q=bench
+
+کلاینت‌ها هم در همین ماشین اجرا می‌شن؛ روی ماشین کم‌هسته خودشون بخشی از CPU رو می‌گیرن.
+"""
+import sys
+import os
+import argparse
+import http.cookiejar
+import re
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+# اضافه کردن مسیر پروژه
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+USERNAME = 'bench'
+PASSWORD = 'bench-password'
+
+
+def seed():
+    """ساختن جدول‌ها، کاربر و چند فرم در دیتابیس DATABASE_URL"""
+    import json
+    from app import create_app, db
+    from app.models import Form, Role, User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        role = Role(name='bench')
+        db.session.add(role)
+        db.session.flush()
+        user = User(username=USERNAME, name='bench', mobile='0', role_id=role.id)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.flush()
+        structure = {'rows': 3, 'columns': [{'name': 'نام', 'type': 'text', 'editable_by_user': True}]}
+        for i in range(20):
+            db.session.add(Form(title=f'bench {i}', structure=json.dumps(structure, ensure_ascii=False),
+                                created_by=user.id))
+        db.session.commit()
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def login(base_url):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    page = opener.open(base_url + '/login', timeout=30).read().decode()
+    match = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', page)
+    data = {'username': USERNAME, 'password': PASSWORD}
+    if match:
+        data['csrf_token'] = match.group(1)
+    response = opener.open(base_url + '/login', urllib.parse.urlencode(data).encode(), timeout=30)
+    if '/login' in response.geturl():
+        raise RuntimeError('ورود ناموفق بود')
+    return opener
+
+
+def run_load(base_url, args):
+    paths = args.paths.split(',')
+    stop_at = time.monotonic() + args.seconds
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client(n):
+        try:
+            opener = login(base_url)
+        except (OSError, RuntimeError):
+            with lock:
+                errors[0] += 1
+            return
+        i = n
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                opener.open(base_url + paths[i % len(paths)], timeout=30).read()
+                ok = True
+            except (OSError, urllib.error.HTTPError):
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[int(len(latencies) * q)] * 1000 if latencies else 0
+
+    return len(latencies) / args.seconds, percentile(0.5), percentile(0.95), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the dev server against the pre-fork server')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--paths', default='/dashboard,/form/list')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed()
+        return
+
+    # هر سرور پورت خودش رو داره تا بسته شدن سرور قبلی منتظرمون نذاره
+    servers = [
+        ('dev', args.port, [sys.executable, '-c',
+                            f"from run import app; app.run(host='127.0.0.1', port={args.port}, threaded=True)"]),
+        (f'prefork {args.workers}×{args.threads}', args.port + 1,
+         [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{args.port + 1}',
+          '--workers', str(args.workers), '--threads', str(args.threads)]),
+    ]
+
+    print(f"🏁 {args.clients} کلاینت، {args.seconds} ثانیه، صفحه‌ها: {args.paths}")
+    with tempfile.TemporaryDirectory() as tmp:
+        # هش سبک فقط برای اینکه ورود کلاینت‌ها زمان بنچمارک رو نگیره
+        env = dict(os.environ, LOG_LEVEL='WARNING', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+                   DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'))
+        subprocess.run([sys.executable, __file__, '--seed'], env=env, check=True, cwd=project_root)
+
+        print(f"   {'سرور':<16} {'درخواست/ثانیه':>14} {'p50':>10} {'p95':>10} {'خطا':>6}")
+        for name, port, command in servers:
+            process = subprocess.Popen(command, env=env, cwd=project_root,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                if not wait_for_port(port):
+                    print(f"❌ {name}: سرور بالا نیومد")
+                    continue
+                rate, p50, p95, errors = run_load(f'http://127.0.0.1:{port}', args)
+                print(f"   {name:<16} {rate:>14.1f} {p50:>8.1f}ms {p95:>8.1f}ms {errors:>6}")
+            finally:
+                process.terminate()
+                process.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
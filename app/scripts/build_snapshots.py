@@ -0,0 +1,40 @@
+# scripts/build_snapshots.py
+"""
+ساخت / به‌روزرسانی افزایشی اسنپ‌شات ستونی پاسخ‌ها (app/snapshots.py).
+
+    python scripts/build_snapshots.py            # همه فرم‌ها
+    python scripts/build_snapshots.py 3 7        # فقط فرم‌های 3 و 7
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# اضافه کردن مسیر پروژه
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app import create_app, db
+from app.models import Form
+from app.snapshots import build_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build columnar response snapshots')
+    parser.add_argument('form_ids', nargs='*', type=int)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        folder = app.config['SNAPSHOT_FOLDER']
+        query = Form.query.order_by(Form.id)
+        if args.form_ids:
+            query = query.filter(Form.id.in_(args.form_ids))
+
+        for form in query:
+            added = build_snapshot(form, folder, args.batch_size)
+            print(f"✅ فرم {form.id} ({form.title}): {added} پاسخ جدید")
+
+
+if __name__ == '__main__':
+    main()
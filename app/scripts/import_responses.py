@@ -0,0 +1,56 @@
+# scripts/import_responses.py
+"""
+ورود دسته‌ای پاسخ‌های یک فرم از فایل CSV یا JSONL (app/importer.py).
+
+    python scripts/import_responses.py <form_id> responses.csv --user admin
+    python scripts/import_responses.py 3 offline.jsonl --batch-size 1000
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# اضافه کردن مسیر پروژه
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app import create_app, db
+from app.models import Form, User
+from app.importer import READERS, import_responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import form responses from CSV/JSONL')
+    parser.add_argument('form_id', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=sorted(READERS), help='default: from file extension')
+    parser.add_argument('--user', default='admin', help='username for rows without a username column')
+    parser.add_argument('--batch-size', type=int, default=None)
+    args = parser.parse_args()
+
+    fmt = args.format or Path(args.path).suffix.lstrip('.').lower()
+    if fmt not in READERS:
+        parser.error('format must be csv or jsonl')
+
+    app = create_app()
+    with app.app_context():
+        form = db.session.get(Form, args.form_id)
+        if form is None:
+            print(f"❌ فرم {args.form_id} پیدا نشد")
+            sys.exit(1)
+        user = User.query.filter_by(username=args.user).first()
+        if user is None:
+            print(f"❌ کاربر {args.user} پیدا نشد")
+            sys.exit(1)
+
+        batch_size = args.batch_size or app.config['IMPORT_BATCH_SIZE']
+        with open(args.path, encoding='utf-8-sig', newline='') as f:
+            result = import_responses(form, READERS[fmt](f, form.get_structure()), user.id, batch_size)
+
+        for line, messages in result.errors:
+            print(f"⚠️ خط {line}: {'، '.join(messages)}")
+        print(f"✅ پایان: {result.imported} پاسخ ثبت شد، {result.failed} ردیف خطا داشت")
+        sys.exit(1 if result.failed else 0)
+
+
+if __name__ == '__main__':
+    main()
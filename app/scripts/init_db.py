@@ -8,7 +8,7 @@ current_dir = Path(__file__).parent
 project_root = current_dir.parent
 sys.path.insert(0, str(project_root))
 
-from app import create_app, db
+from app import create_app, db, migrations, search
 from app.models import User, Organization, Area, Position, Role
 
 def get_admin_credentials():
@@ -57,6 +57,11 @@ def main():
     with app.app_context():
         # Create all tables
         db.create_all()
+        # جدول‌ها از روی مدل‌ها کامل ساخته شدن؛ فقط نسخه migration ثبت می‌شه
+        # جدول مجازی FTS جستجو در مدل‌ها نیست و جدا ساخته می‌شه
+        with db.engine.begin() as conn:
+            search.setup(conn)
+        migrations.stamp(db.engine)
         
         # Check if admin already exists
         if User.query.first():
@@ -0,0 +1,67 @@
+# scripts/migrate.py
+"""
+اجرای migrationهای دیتابیس (app/migrations.py).
+
+    python scripts/migrate.py status
+    python scripts/migrate.py upgrade              # تا آخرین نسخه
+    python scripts/migrate.py upgrade --to 2
+    python scripts/migrate.py downgrade --to 2
+    python scripts/migrate.py stamp                # ثبت بدون اجرا (دیتابیس ساخته شده با create_all)
+
+قبل از upgrade روی دیتابیس اصلی از scripts/backup_db.py استفاده کن.
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# اضافه کردن مسیر پروژه
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app import create_app, db
+from app import migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Versioned database migrations')
+    parser.add_argument('command', choices=['status', 'upgrade', 'downgrade', 'stamp'])
+    parser.add_argument('--to', type=int, dest='target')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        engine = db.engine
+
+        if args.command == 'status':
+            applied = migrations.applied_versions(engine)
+            for item in migrations.MIGRATIONS:
+                row = applied.get(item.version)
+                mark = f"✅ {row.applied_at:%Y-%m-%d %H:%M}" if row else "⏳ اجرا نشده"
+                print(f"{item.version:4}  {item.name:25} {mark}")
+            print(f"\nنسخه فعلی: {migrations.current_version(engine)} / آخرین: {migrations.head()}")
+
+        elif args.command == 'upgrade':
+            done = migrations.upgrade(engine, args.target)
+            for item in done:
+                print(f"⬆️  {item.version} {item.name}")
+            print("✅ دیتابیس به‌روز است" if not done else f"✅ {len(done)} migration اجرا شد")
+
+        elif args.command == 'downgrade':
+            if args.target is None:
+                parser.error('downgrade نیاز به --to داره')
+            try:
+                done = migrations.downgrade(engine, args.target)
+            except migrations.MigrationError as e:
+                print(f"❌ {e}")
+                sys.exit(1)
+            for item in done:
+                print(f"⬇️  {item.version} {item.name}")
+            print(f"✅ نسخه فعلی: {migrations.current_version(engine)}")
+
+        elif args.command == 'stamp':
+            migrations.stamp(engine, args.target)
+            print(f"✅ ثبت شد تا نسخه {migrations.current_version(engine)}")
+
+
+if __name__ == '__main__':
+    main()
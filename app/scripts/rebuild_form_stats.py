@@ -0,0 +1,45 @@
+# scripts/rebuild_form_stats.py
+"""
+ساخت دوباره آمار تجمعی فرم‌ها از روی همه پاسخ‌ها (app/form_stats.py).
+لازم بعد از دوره‌ای که FORM_STATS_ENABLED خاموش بوده.
+
+    python scripts/rebuild_form_stats.py            # فرم‌هایی که آمارشون ساخته نشده
+    python scripts/rebuild_form_stats.py --all      # همه فرم‌ها
+    python scripts/rebuild_form_stats.py 3 7        # فقط فرم‌های 3 و 7
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# اضافه کردن مسیر پروژه
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app import create_app, db
+from app.models import Form
+from app.form_stats import is_built, rebuild_form_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild per-form response statistics')
+    parser.add_argument('form_ids', nargs='*', type=int)
+    parser.add_argument('--all', action='store_true', help='rebuild forms that are already built too')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        query = Form.query.order_by(Form.id)
+        if args.form_ids:
+            query = query.filter(Form.id.in_(args.form_ids))
+
+        for form in query.all():
+            if not (args.all or args.form_ids) and is_built(form.id):
+                continue
+            rebuild_form_stats(form.id, form.get_structure(), args.batch_size)
+            db.session.commit()
+            print(f"✅ فرم {form.id} ({form.title})")
+
+
+if __name__ == '__main__':
+    main()
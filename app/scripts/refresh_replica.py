@@ -0,0 +1,81 @@
+# scripts/refresh_replica.py
+"""
+به‌روزرسانی کپی SQLite که صفحه‌های گزارش ازش می‌خونن (app/replica.py).
+
+با backup API خود SQLite یک کپی سازگار از دیتابیس اصلی در یک فایل موقت
+ساخته می‌شه و بعد با os.replace یکجا جای فایل replica می‌شینه؛ اتصال‌های
+باز روی فایل قبلی کارشون رو تموم می‌کنن و اتصال‌های بعدی فایل جدید رو
+می‌بینن.
+
+    python scripts/refresh_replica.py            # یک بار
+    python scripts/refresh_replica.py --loop     # هر REPLICA_REFRESH_INTERVAL ثانیه
+    python scripts/refresh_replica.py --loop --interval 30
+
+اگر replica دیتابیس سرور باشه، به‌روزرسانی کار خود replication سرور است و
+این اسکریپت کاری نمی‌کنه.
+"""
+import sys
+import os
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+
+# اضافه کردن مسیر پروژه
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy.engine import make_url
+from app import create_app
+from app.replica import replica_path
+
+
+def refresh(primary, target):
+    """کپی primary در target به صورت atomic؛ برگرداندن زمان (ثانیه)"""
+    start = time.perf_counter()
+    tmp = f'{target}.tmp-{os.getpid()}'
+    source = sqlite3.connect(primary)
+    copy = sqlite3.connect(tmp)
+    try:
+        source.backup(copy)
+        # replica با mode=ro باز می‌شه؛ فایل WAL کنارش نباید لازم باشه
+        copy.execute('PRAGMA journal_mode=DELETE')
+        copy.commit()
+    finally:
+        copy.close()
+        source.close()
+    os.replace(tmp, target)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh the read-only SQLite replica')
+    parser.add_argument('--loop', action='store_true')
+    parser.add_argument('--interval', type=int, help='default: REPLICA_REFRESH_INTERVAL')
+    args = parser.parse_args()
+
+    app = create_app()
+    target = replica_path(app.config)
+    if not app.config.get('REPLICA_DATABASE_URL'):
+        print("⚠️ REPLICA_DATABASE_URL تنظیم نشده؛ کاری برای انجام نیست")
+        return
+    if target is None:
+        print("ℹ️ replica دیتابیس سرور است و با replication خود سرور به‌روز می‌شه")
+        return
+
+    primary = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if primary.get_backend_name() != 'sqlite':
+        print("❌ کپی فایل فقط وقتی دیتابیس اصلی SQLite باشه ممکنه")
+        sys.exit(1)
+
+    interval = args.interval or app.config.get('REPLICA_REFRESH_INTERVAL', 60)
+    while True:
+        elapsed = refresh(primary.database, target)
+        print(f"✅ replica به‌روز شد: {target} ({elapsed:.2f}s)")
+        if not args.loop:
+            break
+        time.sleep(interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+# serve.py
+"""
+اجرای برنامه برای محیط عملیاتی: یک پردازه اصلی و چند worker (pre-fork).
+
+run.py سرور توسعه Werkzeug رو با debug اجرا می‌کنه (یک پردازه، reload کد).
+اینجا پردازه اصلی create_app() رو یک بار می‌سازه، سوکت رو باز می‌کنه و
+SERVER_WORKERS پردازه fork می‌کنه؛ هر worker با SERVER_THREADS thread
+درخواست‌ها رو جواب می‌ده. سرویس شبکه‌ای دیگه‌ای لازم نیست (فقط Werkzeug).
+
+    python serve.py
+    python serve.py --bind 0.0.0.0:8000 --workers 4 --threads 8
+    python serve.py --max-requests 2000 --max-memory 400 --no-preload
+
+worker بعد از SERVER_MAX_REQUESTS درخواست یا وقتی حافظه‌اش از
+SERVER_MAX_MEMORY_MB بیشتر بشه، درخواست‌های در حال اجرا رو تموم می‌کنه و
+خارج می‌شه؛ پردازه اصلی یکی جدید جاش می‌سازه.
+
+سیگنال‌ها (به پردازه اصلی):
+    SIGHUP    workerهای جدید ساخته می‌شن و قبلی‌ها بعد از تموم کردن کارشون خارج می‌شن؛
+              با --no-preload هر worker برنامه رو خودش import می‌کنه پس کد جدید خونده می‌شه
+    SIGTERM   همه workerها درخواست جدید نمی‌گیرن، کارهای جاری رو تموم می‌کنن و خارج
+    SIGINT    مثل SIGTERM (Ctrl+C)
+
+هر worker آمار (/metrics)، کش‌ها، pool هش رمز و محدودیت ورود حافظه‌ای خودش
+رو داره؛ برای محدودیت ورود مشترک LOGIN_LIMIT_BACKEND=database و با چند
+worker مقدار PASSWORD_HASH_WORKERS رو کمتر بگیرید.
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from config import Config
+
+
+class RequestHandler(WSGIRequestHandler):
+    # بدون keep-alive؛ اتصال بیکار یک thread از تعداد محدود رو نگه نمی‌داره
+    protocol_version = 'HTTP/1.0'
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """سرور Werkzeug با تعداد ثابت thread؛ وقتی همه مشغولن اتصال جدید قبول نمی‌کنه"""
+
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, host, port, app, threads, on_request=None, **kwargs):
+        self._pool = None
+        super().__init__(host, port, app, handler=RequestHandler, **kwargs)
+        self.on_request = on_request
+        self._slots = threading.Semaphore(threads)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+        self._stopping = False
+        # سوکت مشترک بین workerها؛ اگر worker دیگه‌ای اتصال رو برداشت accept منتظر نمی‌مونه
+        self.socket.setblocking(False)
+
+    def get_request(self):
+        # تا threadی آزاد نشه اتصال برداشته نمی‌شه و به workerهای دیگه می‌رسه
+        self._slots.acquire()
+        try:
+            conn, address = super().get_request()
+        except BaseException:
+            self._slots.release()
+            raise
+        conn.setblocking(True)
+        return conn, address
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+            if self.on_request is not None:
+                self.on_request()
+
+    def stop(self):
+        """توقف گرفتن درخواست جدید (از هر thread، حتی signal handler)"""
+        if not self._stopping:
+            self._stopping = True
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def server_close(self):
+        # صبر برای درخواست‌های در حال اجرا، بعد بستن سوکت
+        # (BaseWSGIServer با fd همین رو در __init__ هم صدا می‌زنه، قبل از ساختن pool)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        super().server_close()
+
+
+def memory_mb():
+    """حافظه فعلی (RSS) این پردازه به مگابایت"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1048576
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_bind(value):
+    host, _, port = value.rpartition(':')
+    return host.strip('[]') or '0.0.0.0', int(port)
+
+
+def dispose_engines(app, close=True):
+    """اتصال‌های دیتابیس نباید بین پردازه‌ها مشترک باشن"""
+    from app import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+class Arbiter:
+    """پردازه اصلی: ساختن، نظارت و جایگزینی workerها"""
+
+    def __init__(self, args):
+        self.args = args
+        self.app = None
+        self.socket = None
+        self.workers = {}  # pid -> نسل
+        self.generation = 0
+        self.stopping = False
+        self.reloading = False
+
+    # ---------- پردازه اصلی ----------
+
+    def run(self):
+        args = self.args
+        host, port = parse_bind(args.bind)
+        if args.preload:
+            from app import create_app
+            self.app = create_app()
+            dispose_engines(self.app)
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        self.socket = socket.create_server((host, port), family=family, backlog=args.backlog)
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        print(f"🚀 http://{host}:{port} - {args.workers} worker × {args.threads} thread"
+              f"{' (preload)' if args.preload else ''}، pid {os.getpid()}", flush=True)
+
+        while not self.stopping:
+            self._reap()
+            if self.reloading:
+                self.reloading = False
+                self._reload()
+            while len(self._current()) < args.workers and not self.stopping:
+                self._spawn()
+            time.sleep(0.2)
+        self._shutdown()
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_reload(self, signum, frame):
+        self.reloading = True
+
+    def _current(self):
+        return [pid for pid, generation in self.workers.items() if generation == self.generation]
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if not pid:
+                return
+            if self.workers.pop(pid, None) is not None and not self.stopping:
+                code = os.waitstatus_to_exitcode(status)
+                if code:
+                    print(f"⚠️ worker {pid} با کد {code} خارج شد", flush=True)
+                    # جلوگیری از چرخه ساختن و مردن سریع (مثلاً خطای import)
+                    time.sleep(1)
+
+    def _reload(self):
+        # workerهای جدید اول ساخته می‌شن، بعد قبلی‌ها کارشون رو تموم می‌کنن و خارج می‌شن
+        old = list(self.workers)
+        self.generation += 1
+        print(f"🔄 راه‌اندازی دوباره {len(old)} worker", flush=True)
+        for _ in range(self.args.workers):
+            self._spawn()
+        for pid in old:
+            self._signal(pid, signal.SIGTERM)
+
+    def _shutdown(self):
+        print(f"🛑 توقف {len(self.workers)} worker", flush=True)
+        for pid in list(self.workers):
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.args.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            print(f"⚠️ worker {pid} در {self.args.graceful_timeout} ثانیه تموم نشد؛ kill", flush=True)
+            self._signal(pid, signal.SIGKILL)
+        self.socket.close()
+        if self.app is not None:
+            from app import logs
+            logs.stop()
+
+    def _signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            self.workers.pop(pid, None)
+
+    def _spawn(self):
+        if self.app is not None:
+            # thread لاگ نباید وسط نوشتن fork بشه؛ در هر دو پردازه دوباره راه می‌افته
+            from app import logs
+            logs.pause()
+        pid = os.fork()
+        if pid:
+            if self.app is not None:
+                logs.resume()
+            self.workers[pid] = self.generation
+            return
+        try:
+            code = self._worker()
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        os._exit(code)
+
+    # ---------- worker ----------
+
+    def _worker(self):
+        args = self.args
+        for signum in (signal.SIGTERM, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        # Ctrl+C به همه گروه می‌رسه؛ توقف worker فقط از طریق پردازه اصلی
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        from app import logs, passwords
+        app = self.app
+        if app is None:
+            from app import create_app
+            app = create_app()
+        else:
+            dispose_engines(app, close=False)
+            logs.resume()
+
+        # سقف درخواست با کمی تفاوت بین workerها تا همه با هم از نو ساخته نشن
+        max_requests = args.max_requests
+        if max_requests:
+            max_requests += random.randint(0, max(0, args.max_requests_jitter))
+        handled = [0]
+        lock = threading.Lock()
+        host, port = parse_bind(args.bind)
+
+        def on_request():
+            with lock:
+                handled[0] += 1
+                count = handled[0]
+            if max_requests and count >= max_requests:
+                app.logger.info('worker %d بعد از %d درخواست از نو ساخته می‌شه', os.getpid(), count)
+                server.stop()
+            elif args.max_memory and count % 10 == 0 and memory_mb() > args.max_memory:
+                app.logger.info('worker %d با %.0fMB حافظه از نو ساخته می‌شه', os.getpid(), memory_mb())
+                server.stop()
+
+        server = PooledWSGIServer(host, port, app, threads=args.threads,
+                                  on_request=on_request, fd=self.socket.fileno())
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+        app.logger.info('worker %d آماده است', os.getpid())
+        server.serve_forever()
+
+        passwords.get_hasher().shutdown()
+        logs.stop()
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-fork production server')
+    parser.add_argument('--bind', default=Config.SERVER_BIND, help='host:port')
+    parser.add_argument('--workers', type=int, default=Config.SERVER_WORKERS)
+    parser.add_argument('--threads', type=int, default=Config.SERVER_THREADS, help='threads per worker')
+    parser.add_argument('--max-requests', type=int, default=Config.SERVER_MAX_REQUESTS,
+                        help='recycle a worker after this many requests (0 = never)')
+    parser.add_argument('--max-requests-jitter', type=int, default=Config.SERVER_MAX_REQUESTS_JITTER)
+    parser.add_argument('--max-memory', type=int, default=Config.SERVER_MAX_MEMORY_MB,
+                        help='recycle a worker above this RSS in MB (0 = never)')
+    parser.add_argument('--graceful-timeout', type=int, default=Config.SERVER_GRACEFUL_TIMEOUT)
+    parser.add_argument('--backlog', type=int, default=Config.SERVER_BACKLOG)
+    parser.add_argument('--no-preload', dest='preload', action='store_false', default=Config.SERVER_PRELOAD,
+                        help='each worker imports and builds the app (SIGHUP picks up new code)')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        sys.exit('❌ این سرور به fork نیاز داره (لینوکس/مک)؛ روی ویندوز از run.py استفاده کنید')
+    Arbiter(args).run()
+
+
+if __name__ == '__main__':
+    main()